@@ -0,0 +1,100 @@
+"""
+In-process stand-in for a Control4 controller running the Web2Way driver.
+
+Answers the same requests the integration sends:
+
+    GET /?command=get&proxyID=14&variableID=1000,1001  -> {"1000": "1", "1001": "75"}
+    GET /?command=set&proxyID=14&variableID=1001&newValue=40
+
+Every request waits for one of max_concurrency slots, like the single
+driver thread on a real controller, then sleeps for latency +/- jitter
+seconds. A fraction error_rate of requests fail with HTTP 500.
+"""
+import asyncio
+from collections import Counter, defaultdict
+import random
+
+from aiohttp import web
+
+
+class FakeWeb2Way:
+
+    def __init__(self, latency=0.05, jitter=0.02, error_rate=0.0, max_concurrency=4,
+                 seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.variables = defaultdict(dict)
+        self.requests = Counter()
+        self.errors = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.port = None
+        self._random = random.Random(seed)
+        self._semaphore = None
+        self._runner = None
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:{}/'.format(self.port)
+
+    def seed(self, proxy_id, values):
+        """Set the initial values of a proxy's variables."""
+        self.variables[proxy_id].update({str(key): str(value) for key, value in values.items()})
+
+    def change(self, proxy_id, variable_id, value):
+        """Change a variable as if from a keypad or Control4 programming."""
+        self.variables[proxy_id][variable_id] = str(value)
+
+    def reset_stats(self):
+        self.requests.clear()
+        self.errors.clear()
+        self.max_in_flight = self.in_flight
+
+    async def start(self, port=0):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        app = web.Application()
+        app.router.add_get('/', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request):
+        command = request.query.get('command')
+        self.requests[command] += 1
+        async with self._semaphore:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                delay = self._random.gauss(self.latency, self.jitter) if self.jitter else self.latency
+                await asyncio.sleep(max(0, delay))
+                if self._random.random() < self.error_rate:
+                    self.errors[command] += 1
+                    return web.Response(status=500, text='Simulated error')
+                return self._respond(command, request.query)
+            finally:
+                self.in_flight -= 1
+
+    def _respond(self, command, query):
+        try:
+            proxy_id = int(query['proxyID'])
+            variable_ids = query['variableID'].split(',')
+        except (KeyError, ValueError):
+            return web.Response(status=400, text='Expected proxyID and variableID')
+
+        variables = self.variables[proxy_id]
+        if command == 'get':
+            return web.json_response({variable_id: variables.get(variable_id, '')
+                                      for variable_id in variable_ids})
+        if command == 'set' and 'newValue' in query:
+            variables[variable_ids[0]] = query['newValue']
+            return web.json_response({variable_ids[0]: query['newValue']})
+        return web.Response(status=400, text='Unknown command')
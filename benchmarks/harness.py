@@ -0,0 +1,331 @@
+"""
+End-to-end benchmark of the Control4 integration against FakeWeb2Way.
+
+Starts a Home Assistant instance with the custom component from this
+repository, sets up lights, thermostats, alarm panels and media rooms that
+all talk to one fake controller, and then for --duration seconds:
+
+  * sends light, thermostat and media commands through Home Assistant's
+    services and times how long each call takes (command latency), and
+  * changes lights behind Home Assistant's back, as a keypad would, and
+    times how long the change takes to show up in Home Assistant
+    (staleness).
+
+    python benchmarks/harness.py --lights 50 --latency 0.1 --scan-interval 10
+
+Add --json for machine readable output, e.g. to compare runs in CI.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fake_web2way import FakeWeb2Way
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+# pylint: disable=wrong-import-position
+from homeassistant.const import EVENT_STATE_CHANGED, STATE_OFF, STATE_ON
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+
+LIGHT_PROXY_BASE = 1000
+THERMOSTAT_PROXY_BASE = 2000
+ALARM_PROXY_BASE = 3000
+MEDIA_PROXY_BASE = 4000
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of samples, or None if there are none."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'p50': percentile(samples, 0.5),
+        'p99': percentile(samples, 0.99),
+        'max': max(samples) if samples else None,
+    }
+
+
+def add_arguments(parser):
+    """Options shared by every benchmark script."""
+    group = parser.add_argument_group('fake controller')
+    group.add_argument('--latency', type=float, default=0.05,
+                       help='mean seconds the controller takes per request')
+    group.add_argument('--jitter', type=float, default=0.02,
+                       help='standard deviation of the latency')
+    group.add_argument('--error-rate', type=float, default=0.0,
+                       help='fraction of requests answered with HTTP 500')
+    group.add_argument('--max-concurrency', type=int, default=4,
+                       help='requests the controller works on at once')
+    group.add_argument('--seed', type=int, default=None)
+
+    group = parser.add_argument_group('integration')
+    group.add_argument('--lights', type=int, default=20)
+    group.add_argument('--thermostats', type=int, default=4)
+    group.add_argument('--alarms', type=int, default=1)
+    group.add_argument('--media', type=int, default=4)
+    group.add_argument('--scan-interval', type=float, default=30)
+    group.add_argument('--max-scan-interval', type=float, default=300,
+                       help='longest interval unchanged proxies back off to')
+    group.add_argument('--max-concurrent-requests', type=int, default=4)
+    group.add_argument('--timeout', type=int, default=10)
+
+    group = parser.add_argument_group('workload')
+    group.add_argument('--duration', type=float, default=60)
+    group.add_argument('--warmup', type=float, default=5,
+                       help='seconds to let the initial refresh finish first')
+    group.add_argument('--command-rate', type=float, default=2,
+                       help='service calls per second')
+    group.add_argument('--change-rate', type=float, default=0.5,
+                       help='external light changes per second')
+
+
+def _platform_config(options, fake):
+    controller = {
+        'scan_interval': options.scan_interval,
+        'max_scan_interval': options.max_scan_interval,
+        'max_concurrent_requests': options.max_concurrent_requests,
+        'timeout': options.timeout,
+    }
+    lights = [dict(controller, platform='control4', base_url=fake.base_url,
+                   proxy_id=LIGHT_PROXY_BASE + index, name='Bench Light {}'.format(index))
+              for index in range(options.lights)]
+    thermostats = [dict(controller, platform='control4', base_url='http://127.0.0.1',
+                        web_two_way_port=fake.port, proxy_id=THERMOSTAT_PROXY_BASE + index,
+                        name='Bench Thermostat {}'.format(index))
+                   for index in range(options.thermostats)]
+    alarms = [dict(controller, platform='control4', base_url=fake.base_url,
+                   proxy_id=ALARM_PROXY_BASE + index, name='Bench Alarm {}'.format(index))
+              for index in range(options.alarms)]
+    media = [dict(controller, platform='control4', base_url=fake.base_url,
+                  proxy_id=MEDIA_PROXY_BASE + index, name='Bench Media {}'.format(index))
+             for index in range(options.media)]
+    return {
+        'light': lights,
+        'climate': thermostats,
+        'alarm_control_panel': alarms,
+        'media_player': media,
+    }
+
+
+def _seed(options, fake):
+    for index in range(options.lights):
+        fake.seed(LIGHT_PROXY_BASE + index, {'1000': 0, '1001': 0})
+    for index in range(options.thermostats):
+        fake.seed(THERMOSTAT_PROXY_BASE + index, {
+            '1107': 'Off', '1104': 'Heat', '1130': 70, '1134': 74, '1132': 68})
+    for index in range(options.alarms):
+        fake.seed(ALARM_PROXY_BASE + index, {'1002': 1, '1000': 0, '1001': 0})
+    for index in range(options.media):
+        fake.seed(MEDIA_PROXY_BASE + index, {'1000': 0, '1011': 20})
+
+
+async def async_start_hass(config_dir, http_port, platforms):
+    hass = HomeAssistant()
+    hass.config.config_dir = config_dir
+    hass.config.skip_pip = True
+    assert await async_setup_component(hass, 'http', {'http': {'server_port': http_port}})
+    for domain, entries in platforms.items():
+        if entries:
+            assert await async_setup_component(hass, domain, {domain: entries})
+    await hass.async_start()
+    return hass
+
+
+class Workload:
+    """Sends commands and external changes at a steady rate and records how
+    long each took to complete or to be noticed."""
+
+    def __init__(self, hass, fake, options):
+        self._hass = hass
+        self._fake = fake
+        self._options = options
+        self._random = random.Random(options.seed)
+        self.command_latency = []
+        self.command_failures = 0
+        self.staleness = []
+        self._pending = {}
+        # Commands go to even lights and external changes to odd ones, so a
+        # command can never be mistaken for a change arriving.
+        self._commanded_lights = range(0, options.lights, 2)
+        self._changed_lights = range(1, options.lights, 2)
+
+    async def run(self, duration):
+        remove = self._hass.bus.async_listen(EVENT_STATE_CHANGED, self._state_changed)
+        try:
+            await asyncio.gather(
+                self._every(self._options.command_rate, duration, self._command),
+                self._every(self._options.change_rate, duration, self._change))
+        finally:
+            remove()
+
+    @property
+    def missed(self):
+        """External changes Home Assistant had not picked up by the end."""
+        return len(self._pending)
+
+    async def _every(self, rate, duration, action):
+        if rate <= 0:
+            return
+        tasks = []
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            tasks.append(asyncio.ensure_future(action()))
+            await asyncio.sleep(1 / rate)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _targets(self):
+        options = self._options
+        targets = []
+        if self._commanded_lights:
+            targets.append('light')
+        if options.thermostats:
+            targets.append('climate')
+        if options.media:
+            targets.append('media_player')
+        return targets
+
+    async def _command(self):
+        targets = self._targets()
+        if not targets:
+            return
+        domain = self._random.choice(targets)
+        if domain == 'light':
+            index = self._random.choice(self._commanded_lights)
+            entity_id = 'light.bench_light_{}'.format(index)
+            if self._random.random() < 0.5:
+                service, data = 'turn_off', {}
+            else:
+                service, data = 'turn_on', {'brightness': self._random.randint(1, 255)}
+        elif domain == 'climate':
+            entity_id = 'climate.bench_thermostat_{}'.format(
+                self._random.randrange(self._options.thermostats))
+            service, data = 'set_temperature', {'temperature': self._random.randint(60, 80)}
+        else:
+            entity_id = 'media_player.bench_media_{}'.format(
+                self._random.randrange(self._options.media))
+            service, data = 'volume_set', {'volume_level': self._random.random()}
+
+        data['entity_id'] = entity_id
+        started = time.monotonic()
+        try:
+            await self._hass.services.async_call(domain, service, data, blocking=True)
+        except Exception:  # pylint: disable=broad-except
+            self.command_failures += 1
+            return
+        self.command_latency.append(time.monotonic() - started)
+
+    async def _change(self):
+        if not self._changed_lights:
+            return
+        index = self._random.choice(self._changed_lights)
+        entity_id = 'light.bench_light_{}'.format(index)
+        if entity_id in self._pending:
+            return
+        state = self._hass.states.get(entity_id)
+        turn_on = state is None or state.state != STATE_ON
+        self._pending[entity_id] = (STATE_ON if turn_on else STATE_OFF, time.monotonic())
+        self._fake.change(LIGHT_PROXY_BASE + index, '1000', 1 if turn_on else 0)
+
+    def _state_changed(self, event):
+        entity_id = event.data.get('entity_id')
+        new_state = event.data.get('new_state')
+        pending = self._pending.get(entity_id)
+        if pending is None or new_state is None or new_state.state != pending[0]:
+            return
+        del self._pending[entity_id]
+        self.staleness.append(time.monotonic() - pending[1])
+
+
+async def run_benchmark(options, deadline=None, http_port=18123):
+    """Run one benchmark and return its results as a dict. Outside changes
+    that took longer than deadline seconds to show up are counted as
+    late_changes."""
+    fake = FakeWeb2Way(options.latency, options.jitter, options.error_rate,
+                       options.max_concurrency, options.seed)
+    _seed(options, fake)
+    await fake.start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_start_hass(config_dir, http_port, _platform_config(options, fake))
+        try:
+            await asyncio.sleep(options.warmup)
+            fake.reset_stats()
+            workload = Workload(hass, fake, options)
+            started = time.monotonic()
+            await workload.run(options.duration)
+            elapsed = time.monotonic() - started
+            controller = next(iter(hass.data['control4'].values()))
+            diagnostics = controller.async_diagnostics()
+        finally:
+            await hass.async_stop()
+            await fake.stop()
+
+    total = sum(fake.requests.values())
+    return {
+        'entities': options.lights + options.thermostats + options.alarms + options.media,
+        'duration': elapsed,
+        'requests_per_second': total / elapsed,
+        'gets_per_second': fake.requests['get'] / elapsed,
+        'sets_per_second': fake.requests['set'] / elapsed,
+        'server_errors': sum(fake.errors.values()),
+        'server_max_in_flight': fake.max_in_flight,
+        'command_latency': summarize(workload.command_latency),
+        'command_failures': workload.command_failures,
+        'staleness': summarize(workload.staleness),
+        'missed_changes': workload.missed,
+        'late_changes': sum(1 for staleness in workload.staleness
+                            if deadline is not None and staleness > deadline),
+        'controller': diagnostics['scheduler'],
+    }
+
+
+def _format_seconds(value):
+    return '-' if value is None else '{:.3f}s'.format(value)
+
+
+def print_results(results):
+    print('entities:              {}'.format(results['entities']))
+    print('requests/s:            {:.1f} ({:.1f} get, {:.1f} set)'.format(
+        results['requests_per_second'], results['gets_per_second'],
+        results['sets_per_second']))
+    print('server errors:         {}'.format(results['server_errors']))
+    print('server max in flight:  {}'.format(results['server_max_in_flight']))
+    for key, label in (('command_latency', 'command latency'), ('staleness', 'staleness')):
+        summary = results[key]
+        print('{:<22} p50 {}  p99 {}  max {}  (n={})'.format(
+            label + ':', _format_seconds(summary['p50']), _format_seconds(summary['p99']),
+            _format_seconds(summary['max']), summary['count']))
+    print('command failures:      {}'.format(results['command_failures']))
+    print('missed changes:        {}'.format(results['missed_changes']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if options.verbose else logging.WARNING)
+
+    results = asyncio.get_event_loop().run_until_complete(run_benchmark(options))
+    if options.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Whole-house load test: finds how many entities one controller can serve.
+
+For each scan interval in --scan-intervals, runs the end-to-end benchmark
+(see harness.py) with more and more entities, split between the platforms
+like a typical house, until command latency or missed poll deadlines break
+their SLOs. The last entity count that met both is the knee.
+
+A poll deadline is missed when an outside change takes longer than
+--deadline (by default twice the scan interval) to show up in Home
+Assistant, or never shows up at all. Unless --max-scan-interval is given,
+proxies are not allowed to back off past the scan interval, since that would
+miss deadlines on purpose.
+
+    python benchmarks/load.py --max-concurrency 2 --scan-intervals 30,10 \\
+        --start 100 --step 100 --max-entities 1000
+"""
+import argparse
+import asyncio
+import copy
+import json
+import logging
+
+from harness import add_arguments, run_benchmark
+
+# How a house's proxies are usually split between the platforms.
+PLATFORM_MIX = {
+    'lights': 0.7,
+    'thermostats': 0.08,
+    'alarms': 0.02,
+    'media': 0.2,
+}
+
+
+def _step_options(options, entities, scan_interval):
+    step = copy.copy(options)
+    for platform, share in PLATFORM_MIX.items():
+        setattr(step, platform, int(entities * share))
+    step.lights = max(2, entities - step.thermostats - step.alarms - step.media)
+    step.scan_interval = scan_interval
+    if options.max_scan_interval is None:
+        step.max_scan_interval = scan_interval
+    return step
+
+
+def _missed_deadline_rate(results):
+    late = results['late_changes'] + results['missed_changes']
+    total = results['staleness']['count'] + results['missed_changes']
+    return late / total if total else 0.0
+
+
+async def find_knee(options, scan_interval):
+    """Ramp the entity count at one scan interval. Returns every step's
+    results and the largest entity count that met the SLOs, or None."""
+    deadline = options.deadline or 2 * scan_interval
+    steps = []
+    knee = None
+    entities = options.start
+    while entities <= options.max_entities:
+        results = await run_benchmark(_step_options(options, entities, scan_interval),
+                                      deadline)
+        results['scan_interval'] = scan_interval
+        results['missed_deadline_rate'] = _missed_deadline_rate(results)
+        p99 = results['command_latency']['p99']
+        results['within_slo'] = ((p99 is None or p99 <= options.command_slo)
+                                 and results['missed_deadline_rate'] <= options.deadline_slo)
+        steps.append(results)
+        _print_step(results)
+        if not results['within_slo']:
+            break
+        knee = results['entities']
+        entities += options.step
+    return steps, knee
+
+
+def _print_step(results):
+    p99 = results['command_latency']['p99']
+    print('scan {:>6.1f}s  entities {:>5}  {:>7.1f} req/s  command p99 {:>8}  '
+          'missed deadlines {:>5.1%}  {}'.format(
+              results['scan_interval'], results['entities'],
+              results['requests_per_second'],
+              '-' if p99 is None else '{:.3f}s'.format(p99),
+              results['missed_deadline_rate'],
+              'ok' if results['within_slo'] else 'SLO BROKEN'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_arguments(parser)
+    parser.set_defaults(duration=30, max_scan_interval=None)
+    group = parser.add_argument_group('ramp')
+    group.add_argument('--start', type=int, default=50)
+    group.add_argument('--step', type=int, default=50)
+    group.add_argument('--max-entities', type=int, default=1000)
+    group.add_argument('--scan-intervals', default='30',
+                       help='comma separated scan intervals to ramp at, in seconds')
+    group.add_argument('--command-slo', type=float, default=1.0,
+                       help='highest acceptable command latency p99, in seconds')
+    group.add_argument('--deadline', type=float, default=None,
+                       help='seconds an outside change may take to show up')
+    group.add_argument('--deadline-slo', type=float, default=0.05,
+                       help='highest acceptable fraction of missed deadlines')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    loop = asyncio.get_event_loop()
+    report = []
+    for scan_interval in (float(value) for value in options.scan_intervals.split(',')):
+        steps, knee = loop.run_until_complete(find_knee(options, scan_interval))
+        report.append({'scan_interval': scan_interval, 'knee': knee, 'steps': steps})
+
+    if options.json:
+        print(json.dumps(report, indent=2))
+        return
+    print()
+    for result in report:
+        if result['knee'] is None:
+            knee = 'SLOs broken at {} entities'.format(options.start)
+        elif result['steps'][-1]['within_slo']:
+            knee = 'no knee up to {} entities'.format(result['knee'])
+        else:
+            knee = '{} entities'.format(result['knee'])
+        print('scan interval {:.1f}s: {}'.format(result['scan_interval'], knee))
+
+
+if __name__ == '__main__':
+    main()
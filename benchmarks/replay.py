@@ -0,0 +1,235 @@
+"""
+Replays traffic recorded with the control4.start_recording service.
+
+The recording is turned back into what happened on the controller: the
+values first read from each variable, every later change seen by a poll,
+and every value Home Assistant set. A fake controller starts out with those
+values. Each read variable becomes a sensor, and the changes and sets are
+played back at their recorded times, --speed times faster. Scan intervals
+are divided by --speed too, so polling keeps up with the faster changes.
+
+Reports the same numbers as harness.py, plus the request rate of the
+original recording for comparison.
+
+    python benchmarks/replay.py control4_192.168.1.20_20240101-120000.jsonl.gz --speed 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import tempfile
+import time
+
+from fake_web2way import FakeWeb2Way
+from harness import async_start_hass, print_results, summarize
+
+# pylint: disable=wrong-import-position
+from homeassistant.const import EVENT_STATE_CHANGED
+
+from custom_components.control4.traffic import read_recording
+
+
+class Trace:
+    """The controller's side of a recording."""
+
+    def __init__(self, requests):
+        self.initial = {}
+        self.changes = []
+        self.commands = []
+        self.latencies = [request['l'] for request in requests
+                          if request['s'] == 200 and request['l'] is not None]
+        self.duration = requests[-1]['t'] if requests else 0
+        self.request_count = len(requests)
+
+        known = {}
+        last_responses = {}
+        for request in requests:
+            if request['s'] != 200:
+                continue
+            proxy_id = request['p']
+            if request['c'] == 'set':
+                known[(proxy_id, request['v'][0])] = request['n']
+                self.commands.append((request['t'], proxy_id, request['v'][0], request['n']))
+                continue
+
+            key = (proxy_id, tuple(request['v']))
+            text = request.get('r', last_responses.get(key))
+            last_responses[key] = text
+            try:
+                values = json.loads(text)
+            except (TypeError, ValueError):
+                continue
+            for variable_id, value in values.items():
+                variable = (proxy_id, variable_id)
+                if variable not in known:
+                    self.initial[variable] = value
+                elif known[variable] != value:
+                    self.changes.append((request['t'], proxy_id, variable_id, value))
+                known[variable] = value
+
+
+def _entity_id(proxy_id, variable_id):
+    return 'sensor.replay_{}_{}'.format(proxy_id, variable_id)
+
+
+class Replay:
+
+    def __init__(self, hass, fake, trace, speed):
+        self._hass = hass
+        self._fake = fake
+        self._trace = trace
+        self._speed = speed
+        self.command_latency = []
+        self.command_failures = 0
+        self.staleness = []
+        self._pending = {}
+
+    @property
+    def missed(self):
+        return len(self._pending)
+
+    async def run(self):
+        remove = self._hass.bus.async_listen(EVENT_STATE_CHANGED, self._state_changed)
+        try:
+            await asyncio.gather(
+                self._play(self._trace.changes, self._change),
+                self._play(self._trace.commands, self._command))
+        finally:
+            remove()
+
+    async def _play(self, events, action):
+        started = time.monotonic()
+        tasks = []
+        for offset, proxy_id, variable_id, value in events:
+            delay = started + offset / self._speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(action(proxy_id, variable_id, value)))
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _change(self, proxy_id, variable_id, value):
+        self._pending[_entity_id(proxy_id, variable_id)] = (value, time.monotonic())
+        self._fake.change(proxy_id, variable_id, value)
+
+    async def _command(self, proxy_id, variable_id, value):
+        # The set will show up on the sensor too; don't count it as a change.
+        self._pending.pop(_entity_id(proxy_id, variable_id), None)
+        started = time.monotonic()
+        try:
+            await self._hass.services.async_call('control4', 'bulk_set', {
+                'items': [{'proxy_id': proxy_id, 'variable_id': variable_id,
+                           'value': value}],
+            }, blocking=True)
+        except Exception:  # pylint: disable=broad-except
+            self.command_failures += 1
+            return
+        self.command_latency.append(time.monotonic() - started)
+
+    def _state_changed(self, event):
+        entity_id = event.data.get('entity_id')
+        new_state = event.data.get('new_state')
+        pending = self._pending.get(entity_id)
+        if pending is None or new_state is None or new_state.state != pending[0]:
+            return
+        del self._pending[entity_id]
+        self.staleness.append(time.monotonic() - pending[1])
+
+
+async def run_replay(options, trace):
+    latency = options.latency
+    if latency is None:
+        latency = statistics.median(trace.latencies) if trace.latencies else 0.05
+    jitter = options.jitter
+    if jitter is None:
+        jitter = statistics.pstdev(trace.latencies) if len(trace.latencies) > 1 else 0
+
+    fake = FakeWeb2Way(latency / options.speed, jitter / options.speed, options.error_rate,
+                       options.max_concurrency, options.seed)
+    for (proxy_id, variable_id), value in trace.initial.items():
+        fake.seed(proxy_id, {variable_id: value})
+    await fake.start()
+
+    scan_interval = options.scan_interval / options.speed
+    sensors = [{
+        'platform': 'control4',
+        'base_url': fake.base_url,
+        'proxy_id': proxy_id,
+        'variable_id': variable_id,
+        'name': 'Replay {} {}'.format(proxy_id, variable_id),
+        'scan_interval': scan_interval,
+        'max_scan_interval': options.max_scan_interval / options.speed,
+        'max_concurrent_requests': options.max_concurrent_requests,
+    } for proxy_id, variable_id in sorted(trace.initial)]
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_start_hass(config_dir, options.http_port, {'sensor': sensors})
+        try:
+            await asyncio.sleep(options.warmup)
+            fake.reset_stats()
+            replay = Replay(hass, fake, trace, options.speed)
+            started = time.monotonic()
+            await replay.run()
+            # Give the last changes a couple of polls to arrive.
+            await asyncio.sleep(2 * scan_interval)
+            elapsed = time.monotonic() - started
+        finally:
+            await hass.async_stop()
+            await fake.stop()
+
+    total = sum(fake.requests.values())
+    return {
+        'entities': len(sensors),
+        'duration': elapsed,
+        'recorded_requests_per_second':
+            trace.request_count * options.speed / trace.duration if trace.duration else None,
+        'requests_per_second': total / elapsed,
+        'gets_per_second': fake.requests['get'] / elapsed,
+        'sets_per_second': fake.requests['set'] / elapsed,
+        'server_errors': sum(fake.errors.values()),
+        'server_max_in_flight': fake.max_in_flight,
+        'command_latency': summarize(replay.command_latency),
+        'command_failures': replay.command_failures,
+        'staleness': summarize(replay.staleness),
+        'missed_changes': replay.missed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('recording')
+    parser.add_argument('--speed', type=float, default=1,
+                        help='play the recording this many times faster')
+    parser.add_argument('--latency', type=float, default=None,
+                        help='controller latency (default: median of the recording)')
+    parser.add_argument('--jitter', type=float, default=None,
+                        help='latency jitter (default: spread of the recording)')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--scan-interval', type=float, default=30)
+    parser.add_argument('--max-scan-interval', type=float, default=300)
+    parser.add_argument('--max-concurrent-requests', type=int, default=4)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--http-port', type=int, default=18123)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    _, requests = read_recording(options.recording)
+    trace = Trace(requests)
+    print('{} requests over {:.0f}s: {} variables, {} changes, {} sets'.format(
+        trace.request_count, trace.duration, len(trace.initial), len(trace.changes),
+        len(trace.commands)))
+
+    results = asyncio.get_event_loop().run_until_complete(run_replay(options, trace))
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    if results['recorded_requests_per_second'] is not None:
+        print('recorded requests/s:   {:.1f}'.format(results['recorded_requests_per_second']))
+    print_results(results)
+
+
+if __name__ == '__main__':
+    main()
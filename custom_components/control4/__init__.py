@@ -0,0 +1,10 @@
+"""
+Support for Control4 systems. You need to use control4-2way-web-driver
+along with this
+"""
+from .services import async_register_services
+
+
+async def async_setup(hass, config):
+    async_register_services(hass)
+    return True
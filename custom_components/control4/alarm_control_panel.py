@@ -2,24 +2,18 @@
 Support for Control4 Alarm. You need to use control4-2way-web-driver
 along with this
 """
-import asyncio
 import logging
 
-import aiohttp
-import async_timeout
 import voluptuous as vol
-import urllib.parse as urlparse
-from urllib.parse import urlencode
-import json
-import asyncio
 
 import homeassistant.components.alarm_control_panel as alarm
 from homeassistant.components.alarm_control_panel import PLATFORM_SCHEMA
-from homeassistant.const import (CONF_NAME, CONF_TIMEOUT, STATE_ALARM_ARMED_AWAY, STATE_ALARM_ARMED_HOME, STATE_ALARM_DISARMED)
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.const import (CONF_NAME, CONF_SCAN_INTERVAL, CONF_TIMEOUT, STATE_ALARM_ARMED_AWAY, STATE_ALARM_ARMED_HOME, STATE_ALARM_DISARMED)
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.template import Template
-import homeassistant.util.dt as dt_util
+
+from .controller import CONTROLLER_SCHEMA, async_get_controller
+from .entity import Control4Entity
 
 CONF_BASE_URL = 'base_url'
 CONF_PROXY_ID = 'proxy_id'
@@ -44,40 +38,33 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
     vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.positive_int,
     vol.Optional(CONF_USE_V2, default=DEFAULT_USE_V2): cv.boolean,
-})
+}).extend(CONTROLLER_SCHEMA)
 
 _LOGGER = logging.getLogger(__name__)
 
 
 # pylint: disable=unused-argument,
-@asyncio.coroutine
-def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
     name = config.get(CONF_NAME)
     base_url = config.get(CONF_BASE_URL)
     proxy_id = config.get(CONF_PROXY_ID)
-    timeout = config.get(CONF_TIMEOUT)
     use_v2 = config.get(CONF_USE_V2)
+    scan_interval = config.get(CONF_SCAN_INTERVAL)
+    controller = async_get_controller(hass, base_url, config)
 
-    async_add_devices([C4AlarmControlPanel(hass, name, base_url, proxy_id, timeout, use_v2)])
+    async_add_devices([C4AlarmControlPanel(hass, name, controller, proxy_id, use_v2, scan_interval)])
+    controller.async_schedule_initial_refresh()
 
-class C4AlarmControlPanel(alarm.AlarmControlPanel):
+class C4AlarmControlPanel(Control4Entity, alarm.AlarmControlPanel):
 
-    def __init__(self, hass, name, base_url, proxy_id, timeout, use_v2):
+    def __init__(self, hass, name, controller, proxy_id, use_v2, scan_interval):
+        super().__init__(hass, name, controller, proxy_id, scan_interval)
         self._state = STATE_ALARM_DISARMED
-        self.hass = hass
-        self._name = name
-        self._base_url = base_url
-        self._proxy_id = proxy_id
         self._use_v2 = use_v2
-        self._timeout = timeout
         self._disarmed = 0
         self._armedhome = 0
         self._armedaway = 0
 
-    @property
-    def name(self):
-        return self._name
-
     @property
     def state(self):
         """Return the state of the device."""
@@ -94,92 +81,38 @@ class C4AlarmControlPanel(alarm.AlarmControlPanel):
     def supported_features(self) -> int:
         return 0
 
-    def get_url(self, url, params):
-        url_parts = list(urlparse.urlparse(url))
-        query = dict(urlparse.parse_qsl(url_parts[4]))
-        query.update(params)
-        url_parts[4] = urlencode(query)
-
-        return urlparse.urlunparse(url_parts)
-
-    @asyncio.coroutine
-    def update_state(self, variable_id, value):
-        params = {
-            'command': 'set',
-            'proxyID': self._proxy_id,
-            'variableID': variable_id,
-            'newValue': value
-        }
-
-        websession = async_get_clientsession(self.hass)
-        request = None
-        try:
-            with async_timeout.timeout(self._timeout, loop=self.hass.loop):
-                request = yield from websession.get(self.get_url(self._base_url, params))
-                _LOGGER.info(params)
-        except (asyncio.TimeoutError, aiohttp.errors.ClientError):
-            _LOGGER.error("Error while turn on %s", self._base_url)
-            return
-        finally:
-            if request is not None:
-                yield from request.release()
+    @callback
+    def restore_state(self, last_state):
+        self._disarmed = "1" if last_state.state == STATE_ALARM_DISARMED else "0"
+        self._armedhome = "1" if last_state.state == STATE_ALARM_ARMED_HOME else "0"
+        self._armedaway = "1" if last_state.state == STATE_ALARM_ARMED_AWAY else "0"
 
-        if request.status != 200:
-            _LOGGER.error("Can't turn on %s. Is resource/endpoint offline?",
-                          self._base_url)
+    @property
+    def variable_ids(self):
+        if self._use_v2:
+            return [USE_V2_VARIABLE_ID]
+        return [DISARMED_VARIABLE_ID, ARMED_HOME_VARIABLE_ID, ARMED_AWAY_VARIABLE_ID]
 
-    @asyncio.coroutine
-    def async_update(self):
-        """Get the latest data from API and update the state."""
+    @callback
+    def handle_variables(self, values):
         if self._use_v2:
-          params = {
-              'command': 'get',
-              'proxyID': self._proxy_id,
-              'variableID': USE_V2_VARIABLE_ID
-          }
-        else:
-          params = {
-              'command': 'get',
-              'proxyID': self._proxy_id,
-              'variableID': ','.join([DISARMED_VARIABLE_ID, ARMED_HOME_VARIABLE_ID, ARMED_AWAY_VARIABLE_ID])
-          }
-
-        url = self.get_url(self._base_url, params)
-
-        websession = async_get_clientsession(self.hass)
-        request = None
-
-        try:
-            with async_timeout.timeout(self._timeout, loop=self.hass.loop):
-                request = yield from websession.get(url)
-                text = yield from request.text()
-        except (asyncio.TimeoutError, aiohttp.errors.ClientError):
-            _LOGGER.exception("Error while fetch data.")
+          if USE_V2_VARIABLE_ID not in values:
             return
-        finally:
-            if request is not None:
-                yield from request.release()
-        json_text = json.loads(text)
-        if self._use_v2:
-          if json_text[USE_V2_VARIABLE_ID] == "Away":
+          if values[USE_V2_VARIABLE_ID] == "Away":
             self._disarmed = "0"
             self._armedhome = "0"
             self._armedaway = "1"
-          elif json_text[USE_V2_VARIABLE_ID] == "Stay":
+          elif values[USE_V2_VARIABLE_ID] == "Stay":
             self._disarmed = "0"
             self._armedhome = "1"
             self._armedaway = "0"
-          elif json_text[USE_V2_VARIABLE_ID] == "":
+          elif values[USE_V2_VARIABLE_ID] == "":
             self._disarmed = "1"
             self._armedhome = "0"
             self._armedaway = "0"
           else:
             _LOGGER.error('Invalid value received! disarmed={0} armedhome={1} armedaway={2}'.format(self._disarmed, self._armedhome, self._armedaway))
         else:
-          try:
-              self._disarmed = json_text[DISARMED_VARIABLE_ID]
-              self._armedhome = json_text[ARMED_HOME_VARIABLE_ID]
-              self._armedaway = json_text[ARMED_AWAY_VARIABLE_ID]
-          except ValueError:
-            _LOGGER.error('Invalid value received! disarmed={0} armedhome={1} armedaway={2}'.format(self._disarmed, self._armedhome, self._armedaway))
-
+          self._disarmed = values.get(DISARMED_VARIABLE_ID, self._disarmed)
+          self._armedhome = values.get(ARMED_HOME_VARIABLE_ID, self._armedhome)
+          self._armedaway = values.get(ARMED_AWAY_VARIABLE_ID, self._armedaway)
@@ -0,0 +1,120 @@
+"""
+Helpers for merging requests to the control4-2way-web-driver.
+"""
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ReadBatcher:
+    """Merge reads for the same proxy that arrive within one batch window
+    into a single request for the union of their variable IDs."""
+
+    def __init__(self, hass, fetch, window):
+        self._hass = hass
+        self._fetch = fetch
+        self._window = window
+        self._pending = {}
+
+    async def async_read(self, proxy_id, variable_ids, source):
+        """Queue a read of variable_ids on proxy_id and return the values
+        for just those variables, or None if the request failed. source says
+        why the read was made; a merged read lists every reason."""
+        pending = self._pending.get(proxy_id)
+        if pending is None:
+            pending = (set(), self._hass.loop.create_future(), set())
+            self._pending[proxy_id] = pending
+            self._hass.loop.call_later(self._window, self._flush, proxy_id)
+        pending[0].update(variable_ids)
+        pending[2].add(source)
+
+        values = await asyncio.shield(pending[1])
+        if values is None:
+            return None
+        return {variable_id: values[variable_id]
+                for variable_id in variable_ids if variable_id in values}
+
+    def _flush(self, proxy_id):
+        variable_ids, future, sources = self._pending.pop(proxy_id)
+        self._hass.async_create_task(
+            self._async_fetch(proxy_id, sorted(variable_ids), '+'.join(sorted(sources)),
+                              future))
+
+    async def _async_fetch(self, proxy_id, variable_ids, source, future):
+        try:
+            values = await self._fetch(proxy_id, variable_ids, source)
+        except Exception as err:  # pylint: disable=broad-except
+            future.set_exception(err)
+        else:
+            future.set_result(values)
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+    Callers that arrive while a call for their key is running await its result
+    instead of starting another one."""
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._in_flight = {}
+
+    async def async_run(self, key, factory):
+        future = self._in_flight.get(key)
+        if future is None:
+            future = self._hass.loop.create_future()
+            self._in_flight[key] = future
+            self._hass.async_create_task(self._async_call(key, factory, future))
+        return await asyncio.shield(future)
+
+    async def _async_call(self, key, factory, future):
+        try:
+            result = await factory()
+        except Exception as err:  # pylint: disable=broad-except
+            future.set_exception(err)
+        else:
+            future.set_result(result)
+        finally:
+            del self._in_flight[key]
+
+
+class WriteCoalescer:
+    """Latest-wins writes per key. While a write for a key is in flight only
+    the newest value waiting behind it is kept; it is sent as soon as the
+    in-flight write finishes. Callers whose value was dropped get the result
+    of the write that replaced it."""
+
+    def __init__(self, hass):
+        self._hass = hass
+        self._pending = {}
+        self._in_flight = set()
+
+    def is_writing(self, key):
+        """Whether a write for key is in flight or waiting to be sent."""
+        return key in self._in_flight or key in self._pending
+
+    async def async_write(self, key, value, send):
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending[0] = value
+            return await asyncio.shield(pending[1])
+
+        future = self._hass.loop.create_future()
+        self._pending[key] = [value, future]
+        if key not in self._in_flight:
+            self._in_flight.add(key)
+            self._hass.async_create_task(self._async_drain(key, send))
+        return await asyncio.shield(future)
+
+    async def _async_drain(self, key, send):
+        try:
+            while key in self._pending:
+                value, future = self._pending.pop(key)
+                try:
+                    result = await send(value)
+                except Exception as err:  # pylint: disable=broad-except
+                    future.set_exception(err)
+                else:
+                    future.set_result(result)
+        finally:
+            self._in_flight.discard(key)
@@ -0,0 +1,96 @@
+"""
+Support for reading any Control4 variable as a binary sensor. You need to use
+control4-2way-web-driver along with this
+"""
+import logging
+
+import voluptuous as vol
+
+from homeassistant.components.binary_sensor import (
+    DEVICE_CLASSES_SCHEMA, PLATFORM_SCHEMA, BinarySensorEntity)
+from homeassistant.const import (
+    CONF_DEVICE_CLASS,
+    CONF_NAME,
+    CONF_SCAN_INTERVAL,
+    CONF_TIMEOUT,
+    STATE_ON,
+)
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+
+from .controller import CONTROLLER_SCHEMA, async_get_controller
+from .entity import Control4Entity
+
+CONF_BASE_URL = 'base_url'
+CONF_PROXY_ID = 'proxy_id'
+CONF_VARIABLE_ID = 'variable_id'
+CONF_ON_VALUE = 'on_value'
+
+DEFAULT_NAME = 'Control4 Binary Sensor'
+DEFAULT_TIMEOUT = 10
+DEFAULT_ON_VALUE = '1'
+
+PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
+    vol.Required(CONF_BASE_URL): cv.url,
+    vol.Required(CONF_PROXY_ID): cv.positive_int,
+    vol.Required(CONF_VARIABLE_ID): cv.string,
+    vol.Optional(CONF_ON_VALUE, default=DEFAULT_ON_VALUE): cv.string,
+    vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
+    vol.Optional(CONF_DEVICE_CLASS): DEVICE_CLASSES_SCHEMA,
+    vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.positive_int,
+}).extend(CONTROLLER_SCHEMA)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# pylint: disable=unused-argument,
+async def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
+    name = config.get(CONF_NAME)
+    base_url = config.get(CONF_BASE_URL)
+    proxy_id = config.get(CONF_PROXY_ID)
+    variable_id = config.get(CONF_VARIABLE_ID)
+    on_value = config.get(CONF_ON_VALUE)
+    device_class = config.get(CONF_DEVICE_CLASS)
+    scan_interval = config.get(CONF_SCAN_INTERVAL)
+    controller = async_get_controller(hass, base_url, config)
+
+    async_add_devices([C4BinarySensor(hass, name, controller, proxy_id, variable_id,
+                                      on_value, device_class, scan_interval)])
+    controller.async_schedule_initial_refresh()
+
+class C4BinarySensor(Control4Entity, BinarySensorEntity):
+    """A single Control4 variable that is on when it equals on_value.
+    Sensors on the same proxy are read together in one request."""
+
+    def __init__(self, hass, name, controller, proxy_id, variable_id, on_value,
+                 device_class, scan_interval):
+        super().__init__(hass, name, controller, proxy_id, scan_interval)
+        self._state = None
+        self._variable_id = variable_id
+        self._on_value = on_value
+        self._device_class = device_class
+
+    @property
+    def is_on(self):
+        return self._state
+
+    @property
+    def device_class(self):
+        return self._device_class
+
+    @callback
+    def restore_state(self, last_state):
+        self._state = last_state.state == STATE_ON
+
+    @property
+    def write_variable_id(self):
+        return self._variable_id
+
+    @property
+    def variable_ids(self):
+        return [self._variable_id]
+
+    @callback
+    def handle_variables(self, values):
+        if self._variable_id in values:
+            self._state = values[self._variable_id] == self._on_value
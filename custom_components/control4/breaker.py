@@ -0,0 +1,40 @@
+"""
+Circuit breaker that stops requests to a Control4 controller which has
+stopped answering.
+"""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures. While open,
+    callers should fail fast and send a single probe after next_probe_delay
+    seconds; the delay doubles after every failed probe up to max_probe_delay."""
+
+    def __init__(self, failure_threshold, probe_delay, max_probe_delay):
+        self.failure_threshold = failure_threshold
+        self._initial_probe_delay = probe_delay
+        self._max_probe_delay = max_probe_delay
+        self._probe_delay = probe_delay
+        self.failures = 0
+        self.is_open = False
+
+    def record_success(self):
+        """Returns True if this success closed the breaker."""
+        self.failures = 0
+        self._probe_delay = self._initial_probe_delay
+        if self.is_open:
+            self.is_open = False
+            return True
+        return False
+
+    def record_failure(self):
+        """Returns True if this failure opened the breaker."""
+        self.failures += 1
+        if not self.is_open and self.failures >= self.failure_threshold:
+            self.is_open = True
+            return True
+        return False
+
+    def next_probe_delay(self):
+        delay = self._probe_delay
+        self._probe_delay = min(self._probe_delay * 2, self._max_probe_delay)
+        return delay
@@ -5,13 +5,8 @@ along with this
 import asyncio
 import logging
 
-import aiohttp
 import async_timeout
 import voluptuous as vol
-import urllib.parse as urlparse
-from urllib.parse import urlencode
-import json
-import asyncio
 
 from homeassistant.components.climate import ClimateEntity, PLATFORM_SCHEMA
 from homeassistant.components.climate.const import (
@@ -25,19 +20,24 @@ from homeassistant.components.climate.const import (
     ATTR_TARGET_TEMP_HIGH,
     ATTR_TARGET_TEMP_LOW,
     ATTR_CURRENT_TEMPERATURE,
+    ATTR_HVAC_ACTION,
     SUPPORT_TARGET_TEMPERATURE,
     SUPPORT_TARGET_TEMPERATURE_RANGE
 )
 from homeassistant.const import (
     CONF_NAME,
+    CONF_SCAN_INTERVAL,
     CONF_TIMEOUT,
     TEMP_FAHRENHEIT,
     TEMP_CELSIUS,
     ATTR_TEMPERATURE,
 )
+from homeassistant.core import callback
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.template import Template
+
+from .controller import CONTROLLER_SCHEMA, async_get_controller
+from .entity import Control4Entity
 
 TIMEOUT = 10
 
@@ -85,32 +85,29 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_WEB_EVENT_PORT, default=DEFAULT_WEB_EVENT_PORT): cv.positive_int,
     vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
     vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.positive_int
-})
+}).extend(CONTROLLER_SCHEMA)
 
 _LOGGER = logging.getLogger(__name__)
 
 
-@asyncio.coroutine
-def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
     name = config.get(CONF_NAME)
     base_url = config.get(CONF_BASE_URL) + ':' + str(config.get(CONF_WEB_TWO_WAY_PORT)) + '/'
     event_url = config.get(CONF_BASE_URL) + ':' + str(config.get(CONF_WEB_EVENT_PORT)) + '/'
     proxy_id = config.get(CONF_PROXY_ID)
-    timeout = config.get(CONF_TIMEOUT)
+    scan_interval = config.get(CONF_SCAN_INTERVAL)
+    controller = async_get_controller(hass, base_url, config)
 
-    async_add_devices([C4ClimateDevice(hass, name, base_url, proxy_id, timeout, event_url)])
+    async_add_devices([C4ClimateDevice(hass, name, controller, proxy_id, event_url, scan_interval)])
+    controller.async_schedule_initial_refresh()
 
-class C4ClimateDevice(ClimateEntity):
+class C4ClimateDevice(Control4Entity, ClimateEntity):
 
-    def __init__(self, hass, name, base_url, proxy_id, timeout, event_url):
+    def __init__(self, hass, name, controller, proxy_id, event_url, scan_interval):
+        super().__init__(hass, name, controller, proxy_id, scan_interval)
         self._state = CURRENT_HVAC_IDLE
         self._hvac_mode = HVAC_MODE_OFF
-        self.hass = hass
-        self._name = name
-        self._base_url = base_url;
         self._event_url = event_url;
-        self._proxy_id = proxy_id;
-        self._timeout = timeout
         self._current_temp = 0
         self._target_temp_high = 0
         self._target_temp_low = 0
@@ -118,10 +115,6 @@ class C4ClimateDevice(ClimateEntity):
         self._unit = TEMP_FAHRENHEIT
         self._hvac_modes = [HVAC_MODE_OFF, HVAC_MODE_HEAT, HVAC_MODE_COOL, HVAC_MODE_HEAT_COOL]
 
-    @property
-    def name(self):
-        return self._name
-
     @property
     def supported_features(self):
         """Return the list of supported features."""
@@ -173,7 +166,7 @@ class C4ClimateDevice(ClimateEntity):
     def target_temperature_low(self):
         return self._target_temp_low
 
-    def set_temperature(self, **kwargs):
+    async def async_set_temperature(self, **kwargs):
         temp_low = kwargs.get(ATTR_TARGET_TEMP_LOW)
         temp_high = kwargs.get(ATTR_TARGET_TEMP_HIGH)
         single_temp = kwargs.get(ATTR_TEMPERATURE)
@@ -181,16 +174,18 @@ class C4ClimateDevice(ClimateEntity):
         if single_temp is not None:
           _LOGGER.debug('Single Temp Update Mode: ' + str(single_temp))
           if self._hvac_mode == HVAC_MODE_HEAT:
-            asyncio.run_coroutine_threadsafe(self.update_state(TARGET_TEMP_LOW_VARIABLE_ID, int(single_temp)), self.hass.loop).result()
+            await self.update_state(TARGET_TEMP_LOW_VARIABLE_ID, int(single_temp))
             self._target_temp = single_temp
           elif self._hvac_mode == HVAC_MODE_COOL:
-            asyncio.run_coroutine_threadsafe(self.update_state(TARGET_TEMP_HIGH_VARIABLE_ID, int(single_temp)), self.hass.loop).result()
+            await self.update_state(TARGET_TEMP_HIGH_VARIABLE_ID, int(single_temp))
             self._target_temp = single_temp
         elif temp_low != 0 and temp_high != 0:
           _LOGGER.debug('Dual Update Mode: ' + str(temp_low) + ' to ' + str(temp_high))
-          asyncio.run_coroutine_threadsafe(self.update_state(TARGET_TEMP_LOW_VARIABLE_ID, int(temp_low)), self.hass.loop).result()
+          # The two setpoints are independent variables, so write them concurrently.
+          await asyncio.gather(
+              self.update_state(TARGET_TEMP_LOW_VARIABLE_ID, int(temp_low)),
+              self.update_state(TARGET_TEMP_HIGH_VARIABLE_ID, int(temp_high)))
           self._target_temp_low = temp_low
-          asyncio.run_coroutine_threadsafe(self.update_state(TARGET_TEMP_HIGH_VARIABLE_ID, int(temp_high)), self.hass.loop).result()
           self._target_temp_high = temp_high
         else:
           _LOGGER.warning('Invalid Temperature Values Passed to Update Method.')
@@ -206,8 +201,7 @@ class C4ClimateDevice(ClimateEntity):
 
 #This method uses the Web event driver to issue commands to Control4 to change the HVAC Mode
 #Additional programming in the C4 director is needed to handle the commands and adjust the HVAC Mode
-    @asyncio.coroutine
-    def async_set_hvac_mode(self, hvac_mode):
+    async def async_set_hvac_mode(self, hvac_mode):
       url_str = self._event_url
       if hvac_mode == HVAC_MODE_HEAT:
         self._current_operation = HVAC_MODE_HEAT
@@ -229,88 +223,50 @@ class C4ClimateDevice(ClimateEntity):
       try:
         websession = async_get_clientsession(self.hass)
         request = None
-        with async_timeout.timeout(TIMEOUT, loop=self.hass.loop):
-          request = yield from websession.get(url_str)
+        with async_timeout.timeout(TIMEOUT):
+          request = await websession.get(url_str)
         return
       except:
         _LOGGER.warning('Web Event driver on Control4 Controller is not responding. Please Install the Web Event driver in order to control HVAC Mode')
         return
 
 
-    def get_url(self, url, params):
-        url_parts = list(urlparse.urlparse(url))
-        query = dict(urlparse.parse_qsl(url_parts[4]))
-        query.update(params)
-        url_parts[4] = urlencode(query)
-
-        return urlparse.urlunparse(url_parts)
+    @callback
+    def restore_state(self, last_state):
+        if last_state.state in self._hvac_modes:
+            self._hvac_mode = last_state.state
+        attributes = last_state.attributes
+        self._state = attributes.get(ATTR_HVAC_ACTION, self._state)
+        self._current_temp = attributes.get(ATTR_CURRENT_TEMPERATURE, self._current_temp)
+        self._target_temp = attributes.get(ATTR_TEMPERATURE, self._target_temp)
+        self._target_temp_high = attributes.get(ATTR_TARGET_TEMP_HIGH, self._target_temp_high)
+        self._target_temp_low = attributes.get(ATTR_TARGET_TEMP_LOW, self._target_temp_low)
 
-    @asyncio.coroutine
-    def update_state(self, variable_id, value):
-        params = {
-            'command': 'set',
-            'proxyID': self._proxy_id,
-            'variableID': variable_id,
-            'newValue': value
-        }
-
-        websession = async_get_clientsession(self.hass)
-        request = None
-        try:
-            with async_timeout.timeout(self._timeout, loop=self.hass.loop):
-                request = yield from websession.get(self.get_url(self._base_url, params))
-                _LOGGER.debug(params)
-        except (asyncio.TimeoutError, aiohttp.errors.ClientError):
-            _LOGGER.error("Error while turn on %s", self._base_url)
-            return
-        finally:
-            if request is not None:
-                yield from request.release()
-
-        if request.status != 200:
-            _LOGGER.error("Can't turn on %s. Is resource/endpoint offline?",
-                          self._base_url)
-
-    @asyncio.coroutine
-    def async_update(self):
-        """Get the latest data from API and update the state."""
-        params = {
-            'command': 'get',
-            'proxyID': self._proxy_id,
-            'variableID': ','.join([STATE_VARIABLE_ID, MODE_VARIABLE_ID,
-                CURRENT_TEMP_VARIABLE_ID, TARGET_TEMP_HIGH_VARIABLE_ID,
-                TARGET_TEMP_LOW_VARIABLE_ID])
-        }
-        url = self.get_url(self._base_url, params)
-
-        websession = async_get_clientsession(self.hass)
-        request = None
-
-        try:
-            with async_timeout.timeout(self._timeout, loop=self.hass.loop):
-                request = yield from websession.get(url)
-                text = yield from request.text()
-        except (asyncio.TimeoutError, aiohttp.errors.ClientError):
-            _LOGGER.exception("Error while fetch data.")
-            return
-        finally:
-            if request is not None:
-                yield from request.release()
-        json_text = json.loads(text)
+    @property
+    def variable_ids(self):
+        return [STATE_VARIABLE_ID, MODE_VARIABLE_ID, CURRENT_TEMP_VARIABLE_ID,
+                TARGET_TEMP_HIGH_VARIABLE_ID, TARGET_TEMP_LOW_VARIABLE_ID]
 
+    @callback
+    def handle_variables(self, values):
         try:
-            self._state = STATE_MAPPING[json_text[STATE_VARIABLE_ID]]
-            self._hvac_mode = MODE_MAPPING[json_text[MODE_VARIABLE_ID]]
-            self._current_temp = int(json_text[CURRENT_TEMP_VARIABLE_ID])
-            self._target_temp_high = int(json_text[TARGET_TEMP_HIGH_VARIABLE_ID])
-            self._target_temp_low = int(json_text[TARGET_TEMP_LOW_VARIABLE_ID])
-           # self._unit = UNIT_MAPPING[json_text[UNIT_VARIABLE_ID]]
-            
-            if self._hvac_mode == HVAC_MODE_HEAT:
-              self._target_temp = int(json_text[TARGET_TEMP_LOW_VARIABLE_ID])
-            elif self._hvac_mode == HVAC_MODE_COOL:
-              self._target_temp = int(json_text[TARGET_TEMP_HIGH_VARIABLE_ID])
-            else:
-              self._target_temp = 0
-        except ValueError:
+            if STATE_VARIABLE_ID in values:
+                self._state = STATE_MAPPING[values[STATE_VARIABLE_ID]]
+            if MODE_VARIABLE_ID in values:
+                self._hvac_mode = MODE_MAPPING[values[MODE_VARIABLE_ID]]
+            if CURRENT_TEMP_VARIABLE_ID in values:
+                self._current_temp = int(values[CURRENT_TEMP_VARIABLE_ID])
+            if TARGET_TEMP_HIGH_VARIABLE_ID in values:
+                self._target_temp_high = int(values[TARGET_TEMP_HIGH_VARIABLE_ID])
+            if TARGET_TEMP_LOW_VARIABLE_ID in values:
+                self._target_temp_low = int(values[TARGET_TEMP_LOW_VARIABLE_ID])
+           # self._unit = UNIT_MAPPING[values[UNIT_VARIABLE_ID]]
+        except (KeyError, ValueError):
             _LOGGER.warning('Invalid value received')
+
+        if self._hvac_mode == HVAC_MODE_HEAT:
+            self._target_temp = self._target_temp_low
+        elif self._hvac_mode == HVAC_MODE_COOL:
+            self._target_temp = self._target_temp_high
+        else:
+            self._target_temp = 0
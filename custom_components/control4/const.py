@@ -0,0 +1,100 @@
+"""
+Constants shared by the Control4 platforms.
+"""
+from datetime import timedelta
+
+DOMAIN = 'control4'
+
+CONF_BASE_URL = 'base_url'
+CONF_PROXY_ID = 'proxy_id'
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_SCAN_INTERVAL = timedelta(seconds=30)
+
+# How often the controller checks which subscriptions are due for a poll.
+POLL_TICK = timedelta(seconds=1)
+
+# Reads for the same proxy that arrive within this many seconds of each other
+# are sent to the controller as a single request.
+READ_BATCH_WINDOW = 0.05
+
+CONF_MAX_CONCURRENT_REQUESTS = 'max_concurrent_requests'
+DEFAULT_MAX_CONCURRENT_REQUESTS = 4
+
+# Fractional part of the golden ratio, used to stagger polls of different
+# proxies across their scan interval.
+PHASE_MULTIPLIER = 0.6180339887498949
+
+PUSH_URL = '/api/control4/event'
+
+# Once Control4 programming pushes changes for a proxy, polls of that proxy
+# only run this often to catch missed notifications.
+PUSH_SWEEP_INTERVAL = timedelta(minutes=5)
+
+# Polls of proxies whose values have not changed back off exponentially from
+# scan_interval up to this ceiling.
+CONF_MAX_SCAN_INTERVAL = 'max_scan_interval'
+DEFAULT_MAX_SCAN_INTERVAL = timedelta(minutes=5)
+
+# Congestion control for polls. The moving average of request latency is
+# updated with this weight per request, and polls are throttled while it is
+# above CONGESTION_LATENCY seconds. Poll intervals are stretched at most
+# MAX_POLL_RATE_SCALE times and recover by POLL_RATE_RECOVERY_STEP per
+# successful request.
+LATENCY_EWMA_WEIGHT = 0.2
+CONGESTION_LATENCY = 1.0
+MAX_POLL_RATE_SCALE = 8.0
+POLL_RATE_RECOVERY_STEP = 0.1
+
+# After this many consecutive failed requests a controller is marked
+# unavailable and probed every PROBE_DELAY seconds, doubling up to
+# MAX_PROBE_DELAY, until it answers again.
+BREAKER_FAILURE_THRESHOLD = 3
+PROBE_DELAY = 5
+MAX_PROBE_DELAY = 300
+
+# Each controller gets its own keep-alive connection pool. Idle connections
+# are kept for KEEPALIVE_TIMEOUT seconds and the controller's address is
+# cached for DNS_CACHE_TTL seconds.
+CONF_MAX_CONNECTIONS = 'max_connections'
+DEFAULT_MAX_CONNECTIONS = 5
+KEEPALIVE_TIMEOUT = 30
+DNS_CACHE_TTL = 300
+
+SERVICE_BULK_SET = 'bulk_set'
+EVENT_BULK_SET_RESULT = 'control4_bulk_set_result'
+DEFAULT_BULK_MAX_PARALLEL = 8
+BULK_ORDER_CONCURRENT = 'concurrent'
+BULK_ORDER_SEQUENTIAL = 'sequential'
+
+# Traffic recordings for benchmarks/replay.py. Without a filename they are
+# written to the config directory.
+SERVICE_START_RECORDING = 'start_recording'
+SERVICE_STOP_RECORDING = 'stop_recording'
+RECORDING_FILENAME = 'control4_{host}_{time}.jsonl.gz'
+
+# control4.profile writes its report to the config directory. Sampling mode
+# looks at the event loop every DEFAULT_PROFILE_INTERVAL seconds.
+SERVICE_PROFILE = 'profile'
+PROFILE_FILENAME = 'control4_profile_{time}{extension}'
+DEFAULT_PROFILE_DURATION = 60
+DEFAULT_PROFILE_INTERVAL = 0.005
+
+# Shortly after a controller's platforms are set up, every proxy that has not
+# been read yet is refreshed once, at most INITIAL_REFRESH_CONCURRENCY
+# proxies at a time and INITIAL_REFRESH_RATE proxies per second. Entities
+# whose proxy hasn't answered INITIAL_REFRESH_DEADLINE seconds after it was
+# read are marked unavailable until they do; time spent waiting for the rate
+# limit doesn't count.
+INITIAL_REFRESH_DELAY = 1
+INITIAL_REFRESH_CONCURRENCY = 4
+INITIAL_REFRESH_RATE = 10
+INITIAL_REFRESH_DEADLINE = 30
+
+# Each controller keeps its last TRACE_SIZE requests in memory for the
+# diagnostics view.
+TRACE_SIZE = 2000
+
+# Request metrics for every controller are served here, and can be shown as
+# sensors with a `metrics: true` sensor entry.
+DIAGNOSTICS_URL = '/api/control4/diagnostics'
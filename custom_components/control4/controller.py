@@ -0,0 +1,663 @@
+"""
+Shared connection to a Control4 controller running the control4-2way-web-driver.
+All entities that point at the same base_url share one Control4Controller,
+which owns the poll loop for every proxy on that controller.
+"""
+import asyncio
+from itertools import groupby
+import logging
+import math
+import time
+
+import aiohttp
+import async_timeout
+import urllib.parse as urlparse
+from urllib.parse import urlencode
+import json
+
+import voluptuous as vol
+
+from homeassistant.const import CONF_TIMEOUT, EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+
+from .batching import ReadBatcher, SingleFlight, WriteCoalescer
+from .breaker import CircuitBreaker
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_MAX_CONNECTIONS,
+    CONF_MAX_SCAN_INTERVAL,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_MAX_SCAN_INTERVAL,
+    DEFAULT_TIMEOUT,
+    DNS_CACHE_TTL,
+    DOMAIN,
+    INITIAL_REFRESH_CONCURRENCY,
+    INITIAL_REFRESH_DEADLINE,
+    INITIAL_REFRESH_DELAY,
+    INITIAL_REFRESH_RATE,
+    KEEPALIVE_TIMEOUT,
+    MAX_PROBE_DELAY,
+    PHASE_MULTIPLIER,
+    POLL_TICK,
+    PROBE_DELAY,
+    PUSH_SWEEP_INTERVAL,
+    READ_BATCH_WINDOW,
+    TRACE_SIZE,
+)
+from .diagnostics import Control4DiagnosticsView
+from .metrics import (
+    COMMAND_GET,
+    COMMAND_SET,
+    OUTCOME_ERROR,
+    OUTCOME_OK,
+    OUTCOME_TIMEOUT,
+    ControllerMetrics,
+)
+from .push import Control4PushView
+from .scheduler import PRIORITY_COMMAND, PRIORITY_POLL, RequestScheduler
+from .trace import (
+    SOURCE_COMMAND,
+    SOURCE_CONFIRM,
+    SOURCE_INITIAL,
+    SOURCE_POLL,
+    SOURCE_REFRESH,
+    RequestTrace,
+)
+from .traffic import TrafficRecorder
+
+_LOGGER = logging.getLogger(__name__)
+
+# Options that apply to the whole controller. They can be given on any
+# platform entry that uses the controller's base_url.
+CONTROLLER_SCHEMA = {
+    vol.Optional(CONF_MAX_CONCURRENT_REQUESTS,
+                 default=DEFAULT_MAX_CONCURRENT_REQUESTS): cv.positive_int,
+    vol.Optional(CONF_MAX_SCAN_INTERVAL,
+                 default=DEFAULT_MAX_SCAN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_MAX_CONNECTIONS,
+                 default=DEFAULT_MAX_CONNECTIONS): cv.positive_int,
+}
+
+
+def get_url(url, params):
+    url_parts = list(urlparse.urlparse(url))
+    query = dict(urlparse.parse_qsl(url_parts[4]))
+    query.update(params)
+    url_parts[4] = urlencode(query)
+
+    return urlparse.urlunparse(url_parts)
+
+
+@callback
+def async_get_controller(hass, base_url, config):
+    """Return the shared controller for base_url, creating it if needed.
+    When several entries configure the same controller the longest timeout
+    and the lowest concurrency limit and max_scan_interval win."""
+    if DOMAIN not in hass.data:
+        hass.http.register_view(Control4PushView())
+        hass.http.register_view(Control4DiagnosticsView())
+    controllers = hass.data.setdefault(DOMAIN, {})
+    key = base_url.rstrip('/')
+    timeout = config.get(CONF_TIMEOUT, DEFAULT_TIMEOUT)
+    max_concurrent = config.get(CONF_MAX_CONCURRENT_REQUESTS,
+                                DEFAULT_MAX_CONCURRENT_REQUESTS)
+    max_scan_interval = config.get(CONF_MAX_SCAN_INTERVAL,
+                                   DEFAULT_MAX_SCAN_INTERVAL).total_seconds()
+    controller = controllers.get(key)
+    if controller is None:
+        controller = Control4Controller(hass, base_url, timeout, max_concurrent,
+                                        max_scan_interval)
+        controllers[key] = controller
+        controller.async_setup_session(
+            config.get(CONF_MAX_CONNECTIONS, DEFAULT_MAX_CONNECTIONS))
+    else:
+        controller.timeout = max(controller.timeout, timeout)
+        controller.scheduler.max_in_flight = min(
+            controller.scheduler.max_in_flight, max_concurrent)
+        controller.max_scan_interval = min(
+            controller.max_scan_interval, max_scan_interval)
+    return controller
+
+
+def poll_phase(proxy_id):
+    """Stable offset in [0, 1) of a proxy's polls within its interval.
+    Multiplying by the golden ratio spreads consecutive proxy IDs evenly
+    and does not depend on which other proxies are configured."""
+    return (proxy_id * PHASE_MULTIPLIER) % 1.0
+
+
+class Subscription:
+    """A set of variables on one proxy that is polled on an interval."""
+
+    def __init__(self, proxy_id, variable_ids, update_callback, interval, phase_key=None,
+                 platform=None):
+        self.proxy_id = proxy_id
+        self.platform = platform
+        self.variable_ids = list(variable_ids)
+        self.update_callback = update_callback
+        self.interval = interval.total_seconds()
+        self.phase = poll_phase(proxy_id if phase_key is None else phase_key)
+        self.push_enabled = False
+        self.timed_out = False
+        self.backoff = 1
+        self.last_values = None
+        self.next_poll = None
+        self.schedule_next(time.monotonic(), self.interval)
+
+    def schedule_next(self, now, interval):
+        """Set next_poll to the first slot after now that lines up with
+        this subscription's phase. The offset comes from the configured
+        interval, so the slots of a backed-off subscription stay a subset of
+        the fast slots and still line up with the proxy's other reads."""
+        offset = self.phase * self.interval
+        slot = math.floor((now - offset) / interval) + 1
+        self.next_poll = slot * interval + offset
+
+
+class Control4Controller:
+
+    def __init__(self, hass, base_url, timeout, max_concurrent, max_scan_interval):
+        self.hass = hass
+        self.base_url = base_url
+        self.host = urlparse.urlparse(base_url).hostname
+        self.timeout = timeout
+        self.max_scan_interval = max_scan_interval
+        self.scheduler = RequestScheduler(hass, max_concurrent)
+        self.metrics = ControllerMetrics()
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, PROBE_DELAY,
+                                      MAX_PROBE_DELAY)
+        self._subscriptions = []
+        self._listeners = []
+        self._unsub_poll = None
+        self._unsub_probe = None
+        self._unsub_initial_refresh = None
+        self.session = None
+        self._read_batcher = ReadBatcher(hass, self.async_get, READ_BATCH_WINDOW)
+        self._single_flight = SingleFlight(hass)
+        self._write_coalescer = WriteCoalescer(hass)
+        self._last_ack = {}
+        self._last_responses = {}
+        self.trace = RequestTrace(TRACE_SIZE)
+        self.recorder = None
+        self._unsub_recording = None
+
+    @callback
+    def async_setup_session(self, max_connections):
+        """Create this controller's own keep-alive connection pool, so
+        requests skip the TCP handshake and don't compete with other
+        integrations for connections, then warm it up."""
+        connector = aiohttp.TCPConnector(
+            limit_per_host=max_connections,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL)
+        self.session = aiohttp.ClientSession(connector=connector)
+
+        async def _async_close_session(event):
+            await self.async_stop_recording()
+            await self.session.close()
+
+        self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session)
+        self.hass.async_create_task(self._async_warm_up())
+
+    async def _async_warm_up(self):
+        """Open the first connection and resolve the controller's address
+        before any entity needs them."""
+        request = None
+        try:
+            with async_timeout.timeout(self.timeout):
+                request = await self.session.get(self.base_url)
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            _LOGGER.debug('Could not open a connection to %s yet', self.base_url)
+        finally:
+            if request is not None:
+                request.release()
+
+    @callback
+    def async_subscribe(self, proxy_id, variable_ids, update_callback, interval,
+                        phase_key=None, platform=None):
+        """Poll variable_ids on proxy_id every interval and pass the values
+        to update_callback. Subscriptions given the same phase_key are
+        polled together; by default the phase comes from proxy_id. platform
+        labels the subscription's requests in the metrics."""
+        subscription = Subscription(proxy_id, variable_ids, update_callback, interval,
+                                    phase_key, platform)
+        self._subscriptions.append(subscription)
+        if self._unsub_poll is None:
+            self._unsub_poll = async_track_time_interval(
+                self.hass, self._async_poll, POLL_TICK)
+        return subscription
+
+    @callback
+    def async_unsubscribe(self, subscription):
+        self._subscriptions.remove(subscription)
+        if not self._subscriptions and self._unsub_poll is not None:
+            self._unsub_poll()
+            self._unsub_poll = None
+
+    @property
+    def available(self):
+        return not self.breaker.is_open
+
+    @callback
+    def async_diagnostics(self):
+        """Request metrics, the scheduler's current state and the most
+        recent requests."""
+        return {
+            'available': self.available,
+            'metrics': self.metrics.as_dict(),
+            'scheduler': {
+                'in_flight': self.scheduler.in_flight,
+                'queue_depth': self.scheduler.queue_depth,
+                'poll_window': self.scheduler.poll_window,
+                'poll_rate_scale': self.scheduler.poll_rate_scale,
+                'latency': self.scheduler.latency,
+            },
+            'subscriptions': len(self._subscriptions),
+            'trace': self.trace.as_list(),
+        }
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Call update_callback whenever the controller becomes available or
+        unavailable. Returns a function that removes the listener."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_record_success(self):
+        if self.breaker.record_success():
+            _LOGGER.info('Control4 controller %s is available again', self.base_url)
+            if self._unsub_probe is not None:
+                self._unsub_probe()
+                self._unsub_probe = None
+            monotonic = time.monotonic()
+            for subscription in self._subscriptions:
+                subscription.backoff = 1
+                subscription.schedule_next(monotonic, self._poll_interval(subscription))
+            for update_callback in list(self._listeners):
+                update_callback()
+
+    @callback
+    def _async_record_failure(self):
+        if self.breaker.record_failure():
+            _LOGGER.warning('Control4 controller %s is not responding, marking its '
+                            'devices unavailable', self.base_url)
+            for update_callback in list(self._listeners):
+                update_callback()
+            self._async_schedule_probe()
+
+    @callback
+    def _async_schedule_probe(self):
+        self._unsub_probe = async_call_later(
+            self.hass, self.breaker.next_probe_delay(), self._async_probe)
+
+    async def _async_probe(self, now):
+        """Send one cheap request to see whether the controller is back."""
+        self._unsub_probe = None
+        params = {'command': 'get'}
+        if self._subscriptions:
+            params['proxyID'] = self._subscriptions[0].proxy_id
+            params['variableID'] = self._subscriptions[0].variable_ids[0]
+
+        websession = self.session
+        request = None
+        try:
+            with async_timeout.timeout(self.timeout):
+                request = await websession.get(get_url(self.base_url, params))
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            _LOGGER.debug('Control4 controller %s is still not responding', self.base_url)
+            self._async_schedule_probe()
+            return
+        finally:
+            if request is not None:
+                request.release()
+        self._async_record_success()
+
+    def _poll_interval(self, subscription):
+        """Seconds until the subscription's next poll. Proxies that push
+        their changes are only swept occasionally, and the interval of
+        subscriptions whose values stay the same backs off up to
+        max_scan_interval. All polls slow down while the controller is
+        congested."""
+        if subscription.push_enabled:
+            return max(subscription.interval, PUSH_SWEEP_INTERVAL.total_seconds())
+        interval = min(subscription.interval * subscription.backoff,
+                       max(subscription.interval, self.max_scan_interval))
+        return interval * self.scheduler.poll_rate_scale
+
+    @callback
+    def _async_reset_backoff(self, subscription):
+        """Go back to polling at the subscription's configured interval."""
+        if subscription.backoff != 1:
+            subscription.backoff = 1
+            subscription.schedule_next(time.monotonic(), self._poll_interval(subscription))
+
+    async def _async_poll(self, now):
+        """Refresh every subscription whose poll is due."""
+        if not self.available:
+            return
+        monotonic = time.monotonic()
+        due = []
+        for subscription in self._subscriptions:
+            if subscription.next_poll <= monotonic:
+                subscription.schedule_next(monotonic, self._poll_interval(subscription))
+                due.append(subscription)
+
+        if due:
+            await asyncio.gather(*[self.async_refresh(subscription, SOURCE_POLL)
+                                   for subscription in due])
+
+    @callback
+    def async_schedule_initial_refresh(self):
+        """Read every proxy that hasn't been read yet shortly after platform
+        setup. Setup of each platform entry pushes this back a little, so
+        one refresh covers all the entries for this controller."""
+        if self._unsub_initial_refresh is not None:
+            self._unsub_initial_refresh()
+        self._unsub_initial_refresh = async_call_later(
+            self.hass, INITIAL_REFRESH_DELAY, self._async_initial_refresh)
+
+    async def _async_initial_refresh(self, now):
+        """Refresh unread proxies a few at a time, rate limited so startup
+        never floods the controller. Entities whose proxy was read but didn't
+        answer within the deadline are marked unavailable rather than holding
+        anything up. The deadline only starts once a proxy's turn comes, so
+        waiting on the rate limit never counts against it."""
+        self._unsub_initial_refresh = None
+        pending = [subscription for subscription in self._subscriptions
+                   if subscription.last_values is None]
+        if not pending:
+            return
+
+        semaphore = asyncio.Semaphore(INITIAL_REFRESH_CONCURRENCY)
+
+        async def _async_refresh_proxy(subscriptions, delay):
+            await asyncio.sleep(delay)
+            async with semaphore:
+                try:
+                    with async_timeout.timeout(INITIAL_REFRESH_DEADLINE):
+                        await asyncio.gather(*[self.async_refresh(subscription,
+                                                                  SOURCE_INITIAL)
+                                               for subscription in subscriptions])
+                except asyncio.TimeoutError:
+                    pass
+            if not self.available:
+                # Nothing was sent; the whole controller shows as unavailable.
+                return []
+            return [subscription for subscription in subscriptions
+                    if subscription.last_values is None and
+                    subscription in self._subscriptions]
+
+        by_proxy = sorted(pending, key=lambda sub: sub.proxy_id)
+        refreshes = [
+            _async_refresh_proxy(list(subscriptions), index / INITIAL_REFRESH_RATE)
+            for index, (proxy_id, subscriptions)
+            in enumerate(groupby(by_proxy, key=lambda sub: sub.proxy_id))]
+        timed_out = [subscription for unanswered in await asyncio.gather(*refreshes)
+                     for subscription in unanswered]
+        if timed_out:
+            _LOGGER.warning('%d Control4 devices on %s did not answer within %ss',
+                            len(timed_out), self.base_url, INITIAL_REFRESH_DEADLINE)
+            for subscription in timed_out:
+                subscription.timed_out = True
+            for update_callback in list(self._listeners):
+                update_callback()
+
+    async def async_refresh(self, subscription, source=SOURCE_REFRESH):
+        """Fetch the subscription's variables now and deliver them. Reads for
+        the same proxy made at the same time share one request. source is
+        recorded in the trace."""
+        values = await self._read_batcher.async_read(
+            subscription.proxy_id, subscription.variable_ids, source)
+        if values is None:
+            return
+
+        if values == subscription.last_values:
+            # Nothing changed since the last delivery, so skip parsing and
+            # writing the entity's state again.
+            if subscription.interval * subscription.backoff < self.max_scan_interval:
+                subscription.backoff *= 2
+            return
+
+        subscription.last_values = values
+        subscription.timed_out = False
+        self._async_reset_backoff(subscription)
+        subscription.update_callback(values)
+
+    @callback
+    def async_handle_push(self, proxy_id, values):
+        """Deliver variable values pushed by the controller. Subscriptions on
+        a proxy that pushes drop back to a slow consistency sweep."""
+        for subscription in self._subscriptions:
+            if subscription.proxy_id == proxy_id and not subscription.push_enabled:
+                subscription.push_enabled = True
+                subscription.schedule_next(time.monotonic(),
+                                           self._poll_interval(subscription))
+        self._async_deliver(proxy_id, values)
+
+    @callback
+    def _async_invalidate(self, proxy_id):
+        """Make the next poll of proxy_id reach its entities even if the
+        controller's answer is unchanged, since their state was changed by
+        something other than a poll."""
+        for subscription in self._subscriptions:
+            if subscription.proxy_id == proxy_id:
+                subscription.last_values = None
+
+    @callback
+    def _async_deliver(self, proxy_id, values):
+        """Pass values to every subscription on proxy_id that wants them."""
+        self._async_invalidate(proxy_id)
+        for subscription in self._subscriptions:
+            if subscription.proxy_id != proxy_id:
+                continue
+            wanted = {variable_id: value for variable_id, value in values.items()
+                      if variable_id in subscription.variable_ids}
+            if wanted:
+                subscription.timed_out = False
+                subscription.update_callback(wanted)
+
+    def _is_stale(self, proxy_id, variable_id, sent):
+        """Whether a value read by a request sent at sent may predate a
+        write: the write is still outstanding, or the read was sent before
+        the controller acknowledged it and so may have been answered first."""
+        key = (proxy_id, variable_id)
+        return (self._write_coalescer.is_writing(key) or
+                self._last_ack.get(key, 0) >= sent)
+
+    def _platform_label(self, proxy_id):
+        """Platform to file a read of proxy_id under in the metrics. Reads of
+        a proxy used by several platforms are merged, so they are 'mixed'."""
+        platforms = {subscription.platform for subscription in self._subscriptions
+                     if subscription.proxy_id == proxy_id}
+        if len(platforms) == 1:
+            return platforms.pop()
+        return 'mixed' if platforms else None
+
+    @callback
+    def _async_record_request(self, command, source, platform, proxy_id, variable_ids, value,
+                              slot, status=None, error=None, text=None):
+        """Record a finished request in the metrics, the trace and, if one is
+        running, the traffic recording. error is the exception that made the
+        request fail before it got a response."""
+        if isinstance(error, asyncio.TimeoutError):
+            outcome = OUTCOME_TIMEOUT
+        elif error is not None or status != 200:
+            outcome = OUTCOME_ERROR
+        else:
+            outcome = OUTCOME_OK
+        self.metrics.record(command, platform, outcome, slot.elapsed, slot.queue_wait)
+        if slot.queue_depth is not None:
+            self.metrics.record_queue_depth(slot.queue_depth)
+        self.trace.record(source, command, platform, proxy_id, variable_ids,
+                          slot.queue_wait, slot.elapsed, status, outcome)
+        if self.recorder is not None:
+            self.recorder.record(command, proxy_id, variable_ids, value, status,
+                                 slot.elapsed, text, slot.started)
+
+    async def async_start_recording(self, path, duration=None):
+        """Record every request and response to path until
+        async_stop_recording is called or duration seconds have passed."""
+        await self.async_stop_recording()
+        self.recorder = TrafficRecorder(self.hass, path, self.base_url)
+        if duration is not None:
+            async def _async_stop(now):
+                self._unsub_recording = None
+                await self.async_stop_recording()
+
+            self._unsub_recording = async_call_later(self.hass, duration, _async_stop)
+        _LOGGER.info('Recording traffic to %s in %s', self.base_url, path)
+
+    async def async_stop_recording(self):
+        if self._unsub_recording is not None:
+            self._unsub_recording()
+            self._unsub_recording = None
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            await recorder.async_flush()
+            _LOGGER.info('Recorded %d requests to %s in %s', recorder.count,
+                         self.base_url, recorder.path)
+
+    async def async_get(self, proxy_id, variable_ids, source):
+        """Read variable_ids from proxy_id, returning a dict of values or
+        None if the controller could not be reached. Identical reads that
+        overlap share one request, which is traced with the first caller's
+        source."""
+        variable_ids = tuple(variable_ids)
+        return await self._single_flight.async_run(
+            (proxy_id, variable_ids),
+            lambda: self._async_fetch(proxy_id, variable_ids, source))
+
+    async def _async_fetch(self, proxy_id, variable_ids, source):
+        if not self.available:
+            return None
+
+        params = {
+            'command': 'get',
+            'proxyID': proxy_id,
+            'variableID': ','.join(variable_ids)
+        }
+        url = get_url(self.base_url, params)
+
+        websession = self.session
+        request = None
+        slot = self.scheduler.request(PRIORITY_POLL)
+        platform = self._platform_label(proxy_id)
+
+        try:
+            async with slot:
+                with async_timeout.timeout(self.timeout):
+                    _LOGGER.debug(params)
+                    sent = time.monotonic()
+                    request = await websession.get(url)
+                    text = await request.text()
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.warning("Error while fetch data from %s: %s", self.base_url,
+                            err or type(err).__name__)
+            self._async_record_request(COMMAND_GET, source, platform, proxy_id, variable_ids,
+                                       None, slot, error=err)
+            self._async_record_failure()
+            return None
+        finally:
+            if request is not None:
+                request.release()
+        self._async_record_request(COMMAND_GET, source, platform, proxy_id, variable_ids,
+                                   None, slot, request.status, text=text)
+        self._async_record_success()
+
+        # Most polls return exactly what the last one did; reuse its parsed
+        # values rather than decoding the same response again.
+        cached = self._last_responses.get((proxy_id, variable_ids))
+        if cached is not None and cached[0] == text:
+            values = cached[1]
+        else:
+            try:
+                values = json.loads(text)
+            except ValueError:
+                _LOGGER.warning('Invalid response received from %s', self.base_url)
+                return None
+            self._last_responses[(proxy_id, variable_ids)] = (text, values)
+
+        # Drop values that may have been read before a write landed, so an
+        # in-flight poll can't flip an entity back to its old state.
+        return {variable_id: value for variable_id, value in values.items()
+                if not self._is_stale(proxy_id, variable_id, sent)}
+
+    async def async_set(self, proxy_id, variable_id, value, platform=None):
+        """Write value to variable_id on proxy_id. Returns True on success.
+        Polls of the proxy go back to their configured interval. Writes to a
+        variable that is already being written are coalesced, so only the
+        newest value is sent next. platform labels the request in the
+        metrics."""
+        if not self.available:
+            _LOGGER.error("Can't turn on %s. Controller is not responding.",
+                          self.base_url)
+            return False
+
+        for subscription in self._subscriptions:
+            if subscription.proxy_id == proxy_id:
+                self._async_reset_backoff(subscription)
+        self._async_invalidate(proxy_id)
+
+        return await self._write_coalescer.async_write(
+            (proxy_id, variable_id), value,
+            lambda latest: self._async_send(proxy_id, variable_id, latest, platform))
+
+    async def _async_send(self, proxy_id, variable_id, value, platform):
+        params = {
+            'command': 'set',
+            'proxyID': proxy_id,
+            'variableID': variable_id,
+            'newValue': value
+        }
+
+        websession = self.session
+        request = None
+        slot = self.scheduler.request(PRIORITY_COMMAND)
+        try:
+            async with slot:
+                with async_timeout.timeout(self.timeout):
+                    _LOGGER.debug(params)
+                    request = await websession.get(get_url(self.base_url, params))
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.error("Error while turn on %s", self.base_url)
+            self._async_record_request(COMMAND_SET, SOURCE_COMMAND, platform, proxy_id,
+                                       [variable_id], value, slot, error=err)
+            self._async_record_failure()
+            return False
+        finally:
+            if request is not None:
+                request.release()
+        self._async_record_request(COMMAND_SET, SOURCE_COMMAND, platform, proxy_id,
+                                   [variable_id], value, slot, request.status)
+        self._async_record_success()
+
+        if request.status != 200:
+            _LOGGER.error("Can't turn on %s. Is resource/endpoint offline?",
+                          self.base_url)
+            return False
+
+        self._last_ack[(proxy_id, variable_id)] = time.monotonic()
+        self.hass.async_create_task(self._async_confirm(proxy_id, variable_id))
+        return True
+
+    async def _async_confirm(self, proxy_id, variable_id):
+        """Read back a variable right after writing it so its confirmed
+        value shows up without waiting for the next poll. If a newer write
+        is already queued, its own confirmation read will do this. The read
+        is always a new request: one already in flight may have been sent
+        before the write was acknowledged."""
+        if self._write_coalescer.is_writing((proxy_id, variable_id)):
+            return
+        values = await self._async_fetch(proxy_id, (variable_id,), SOURCE_CONFIRM)
+        if values:
+            self._async_deliver(proxy_id, values)
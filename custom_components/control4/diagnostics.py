@@ -0,0 +1,25 @@
+"""
+Reports request metrics and the most recent requests of every configured
+Control4 controller.
+
+    GET /api/control4/diagnostics
+
+Requires a Home Assistant access token.
+"""
+from homeassistant.components.http import HomeAssistantView
+
+from .const import DIAGNOSTICS_URL, DOMAIN
+
+
+class Control4DiagnosticsView(HomeAssistantView):
+
+    url = DIAGNOSTICS_URL
+    name = 'api:control4:diagnostics'
+    requires_auth = True
+
+    async def get(self, request):
+        hass = request.app['hass']
+        return self.json({
+            base_url: controller.async_diagnostics()
+            for base_url, controller in hass.data.get(DOMAIN, {}).items()
+        })
@@ -0,0 +1,140 @@
+"""
+Base class for entities backed by variables on a Control4 proxy.
+"""
+import asyncio
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import callback
+from homeassistant.helpers.restore_state import RestoreEntity
+
+from .const import DEFAULT_SCAN_INTERVAL
+
+
+class Control4Entity(RestoreEntity):
+    """Entity whose state is pushed to it by the shared Control4Controller
+    instead of being polled by Home Assistant. The last known state is
+    restored at startup until the controller has been read.
+
+    Most entities read variable_ids on a single proxy. Entities spanning
+    several proxies override reads and handle_proxy_variables instead; their
+    proxies are polled in the same slot."""
+
+    def __init__(self, hass, name, controller, proxy_id, scan_interval):
+        self.hass = hass
+        self._name = name
+        self._controller = controller
+        self._proxy_id = proxy_id
+        self._scan_interval = scan_interval or DEFAULT_SCAN_INTERVAL
+        self._subscriptions = []
+        self._remove_listener = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def controller(self):
+        return self._controller
+
+    @property
+    def proxy_id(self):
+        return self._proxy_id
+
+    @property
+    def _platform_domain(self):
+        return self.platform.domain if self.platform is not None else None
+
+    @property
+    def should_poll(self):
+        return False
+
+    @property
+    def available(self):
+        if any(subscription.timed_out for subscription in self._subscriptions):
+            return False
+        return self._controller.available
+
+    @property
+    def variable_ids(self):
+        """Variable IDs on the proxy that make up this entity's state."""
+        raise NotImplementedError()
+
+    @property
+    def reads(self):
+        """(proxy_id, variable_ids) pairs this entity polls."""
+        return [(self._proxy_id, self.variable_ids)]
+
+    @property
+    def write_variable_id(self):
+        """Variable control4.bulk_set writes when an item names this entity
+        without a variable_id, or None if there is no obvious one."""
+        return None
+
+    def write_targets(self, variable_id=None):
+        """(proxy_id, variable_id) pairs control4.bulk_set writes for this
+        entity. Empty if there is nothing sensible to write."""
+        variable_id = variable_id or self.write_variable_id
+        if variable_id is None:
+            return []
+        return [(self._proxy_id, variable_id)]
+
+    @callback
+    def handle_variables(self, values):
+        """Update the entity from a dict of variable ID to value. Only the
+        variables present in values should be applied."""
+        raise NotImplementedError()
+
+    @callback
+    def handle_proxy_variables(self, proxy_id, values):
+        """Like handle_variables, but also told which proxy the values came
+        from, for entities reading several proxies."""
+        self.handle_variables(values)
+
+    @callback
+    def restore_state(self, last_state):
+        """Apply the state saved before Home Assistant was restarted."""
+
+    async def async_added_to_hass(self):
+        # RestoreEntity registers the entity here so its state is saved at
+        # shutdown.
+        await super().async_added_to_hass()
+        last_state = await self.async_get_last_state()
+        if last_state is not None and last_state.state not in (STATE_UNKNOWN,
+                                                               STATE_UNAVAILABLE):
+            self.restore_state(last_state)
+
+        reads = self.reads
+        phase_key = self._proxy_id if len(reads) > 1 else None
+        self._subscriptions = [
+            self._controller.async_subscribe(
+                proxy_id, variable_ids, self._update_callback(proxy_id),
+                self._scan_interval, phase_key, platform=self._platform_domain)
+            for proxy_id, variable_ids in reads]
+        self._remove_listener = self._controller.async_add_listener(
+            self.async_write_ha_state)
+
+    async def async_will_remove_from_hass(self):
+        await super().async_will_remove_from_hass()
+        for subscription in self._subscriptions:
+            self._controller.async_unsubscribe(subscription)
+        self._subscriptions = []
+        if self._remove_listener is not None:
+            self._remove_listener()
+            self._remove_listener = None
+
+    def _update_callback(self, proxy_id):
+        @callback
+        def _async_handle_update(values):
+            self.handle_proxy_variables(proxy_id, values)
+            self.async_write_ha_state()
+
+        return _async_handle_update
+
+    async def async_update(self):
+        """Refresh on demand, e.g. from homeassistant.update_entity."""
+        await asyncio.gather(*[self._controller.async_refresh(subscription)
+                               for subscription in self._subscriptions])
+
+    async def update_state(self, variable_id, value, proxy_id=None):
+        return await self._controller.async_set(proxy_id or self._proxy_id, variable_id,
+                                                value, platform=self._platform_domain)
@@ -5,68 +5,82 @@ along with this
 import asyncio
 import logging
 
-import aiohttp
-import async_timeout
 import voluptuous as vol
-import urllib.parse as urlparse
-from urllib.parse import urlencode
-import json
-import asyncio
 
 from homeassistant.components.media_player import (
-    DOMAIN, PLATFORM_SCHEMA, SUPPORT_VOLUME_SET, MediaPlayerDevice)
-from homeassistant.const import (CONF_NAME, CONF_RESOURCE, CONF_TIMEOUT)
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+    ATTR_MEDIA_VOLUME_LEVEL, DOMAIN, PLATFORM_SCHEMA, SUPPORT_VOLUME_SET,
+    MediaPlayerDevice)
+from homeassistant.const import (CONF_NAME, CONF_SCAN_INTERVAL, CONF_TIMEOUT)
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.template import Template
+
+from .controller import CONTROLLER_SCHEMA, async_get_controller
+from .entity import Control4Entity
 
 
 CONF_BASE_URL = 'base_url'
 CONF_PROXY_ID = 'proxy_id'
 CONF_OUTPUT_ZONE = 'output_zone'
+CONF_MEMBERS = 'members'
 
 DEFAULT_NAME = 'Control4 Media'
 DEFAULT_TIMEOUT = 10
 STATE_VARIABLE_ID = '1000'
 VOLUME_VARIABLE_ID = '1011'
+# Rooms with several output zones expose each zone's volume as 1900 + (zone - 1)
+ZONE_VOLUME_VARIABLE_ID_BASE = 1900
 
-PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend({
-    vol.Required(CONF_BASE_URL): cv.url,
+MEMBER_SCHEMA = vol.Schema({
     vol.Required(CONF_PROXY_ID): cv.positive_int,
+    vol.Optional(CONF_OUTPUT_ZONE): cv.positive_int,
+})
+
+PLATFORM_SCHEMA = vol.All(PLATFORM_SCHEMA.extend({
+    vol.Required(CONF_BASE_URL): cv.url,
+    vol.Exclusive(CONF_PROXY_ID, 'room'): cv.positive_int,
+    vol.Exclusive(CONF_MEMBERS, 'room'): vol.All(cv.ensure_list, [MEMBER_SCHEMA]),
+    vol.Optional(CONF_OUTPUT_ZONE): cv.positive_int,
     vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
     vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.positive_int,
-})
+}).extend(CONTROLLER_SCHEMA), cv.has_at_least_one_key(CONF_PROXY_ID, CONF_MEMBERS))
 
 _LOGGER = logging.getLogger(__name__)
 
 SUPPORT_FLAGS = (SUPPORT_VOLUME_SET)
 
 # pylint: disable=unused-argument,
-@asyncio.coroutine
-def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
     name = config.get(CONF_NAME)
     base_url = config.get(CONF_BASE_URL)
     proxy_id = config.get(CONF_PROXY_ID)
-    timeout = config.get(CONF_TIMEOUT)
-    #output_zone = config.get(CONF_OUTPUT_ZONE)
+    output_zone = config.get(CONF_OUTPUT_ZONE)
+    members = config.get(CONF_MEMBERS)
+    scan_interval = config.get(CONF_SCAN_INTERVAL)
+    controller = async_get_controller(hass, base_url, config)
+
+    if members:
+        async_add_devices([C4MediaGroup(hass, name, controller, members, scan_interval)])
+    else:
+        async_add_devices([C4Media(hass, name, controller, proxy_id, output_zone,
+                                   scan_interval)])
+    controller.async_schedule_initial_refresh()
+
 
-    async_add_devices([C4Media(hass, name, base_url, proxy_id, timeout)])
+def volume_variable_id(output_zone):
+    """Variable holding the volume of a room's output zone, or of the room
+    itself when no zone is given."""
+    if output_zone is None:
+        return VOLUME_VARIABLE_ID
+    return str(ZONE_VOLUME_VARIABLE_ID_BASE + (output_zone - 1))
 
-class C4Media(MediaPlayerDevice):
 
-    def __init__(self, hass, name, base_url, proxy_id, timeout):
+class C4Media(Control4Entity, MediaPlayerDevice):
+
+    def __init__(self, hass, name, controller, proxy_id, output_zone, scan_interval):
+        super().__init__(hass, name, controller, proxy_id, scan_interval)
         self._state = None
         self._volume = 0
-        self.hass = hass
-        self._name = name
-        self._base_url = base_url;
-        self._proxy_id = proxy_id;
-        self._timeout = timeout
-       # VOLUME_VARIABLE_ID = int(1900 + (output_zone - 1))
-
-    @property
-    def name(self):
-        return self._name
+        self._volume_variable_id = volume_variable_id(output_zone)
 
     @property
     def supported_features(self):
@@ -81,13 +95,11 @@ class C4Media(MediaPlayerDevice):
     def volume_level(self):
         return self._volume
 
-   # @asyncio.coroutine
-    def set_volume_level(self, volume):
+    async def async_set_volume_level(self, volume):
         VOLUME_REAL = int(volume*100)
-        asyncio.run_coroutine_threadsafe(self.update_state(VOLUME_VARIABLE_ID, VOLUME_REAL), self.hass.loop).result()
+        await self.update_state(self._volume_variable_id, VOLUME_REAL)
 
         VOLUME_REAL_STRING = str(VOLUME_REAL)
-        VOLUME_VARIABLE_ID_STRING = str(VOLUME_VARIABLE_ID)
         _LOGGER.debug(VOLUME_REAL_STRING)
         self._volume = volume
 
@@ -96,77 +108,92 @@ class C4Media(MediaPlayerDevice):
 #        yield from self.update_state(STATE_VARIABLE_ID, 0)
 #        self._state = False
 
-    def get_url(self, url, params):
-        url_parts = list(urlparse.urlparse(url))
-        query = dict(urlparse.parse_qsl(url_parts[4]))
-        query.update(params)
-        url_parts[4] = urlencode(query)
-
-        return urlparse.urlunparse(url_parts)
-
-    @asyncio.coroutine
-    def update_state(self, variable_id, value):
-        params = {
-            'command': 'set',
-            'proxyID': self._proxy_id,
-            'variableID': variable_id,
-            'newValue': value
-        }
-        _LOGGER.debug("Reached update_state")
-        websession = async_get_clientsession(self.hass)
-        request = None
-        try:
-            with async_timeout.timeout(self._timeout, loop=self.hass.loop):
-                _LOGGER.debug(params)
-                request = yield from websession.get(self.get_url(self._base_url, params))
-        except (asyncio.TimeoutError, aiohttp.errors.ClientError):
-            _LOGGER.error("Error while turn on %s", self._base_url)
-            return
-        finally:
-            if request is not None:
-                yield from request.release()
-
-        if request.status != 200:
-            _LOGGER.error("Can't turn on %s. Is resource/endpoint offline?",
-                          self._base_url)
-
-    @asyncio.coroutine
-    def async_update(self):
-        """Get the latest data from API and update the state."""
-        params = {
-            'command': 'get',
-            'proxyID': self._proxy_id,
-            'variableID': ','.join([STATE_VARIABLE_ID, VOLUME_VARIABLE_ID])
-        }
-        url = self.get_url(self._base_url, params)
-
-        websession = async_get_clientsession(self.hass)
-        request = None
-
-        try:
-            with async_timeout.timeout(self._timeout, loop=self.hass.loop):
-                _LOGGER.debug(params)
-                request = yield from websession.get(url)
-                text = yield from request.text()
-        except (asyncio.TimeoutError, aiohttp.ClientError):
-            _LOGGER.exception("Error while fetch data.")
-            return
-        finally:
-            if request is not None:
-                yield from request.release()
-        json_text = json.loads(text)
-
-        #is_on = json_text[STATE_VARIABLE_ID]
+    @callback
+    def restore_state(self, last_state):
+        self._volume = last_state.attributes.get(ATTR_MEDIA_VOLUME_LEVEL, self._volume)
+
+    @property
+    def write_variable_id(self):
+        return self._volume_variable_id
+
+    @property
+    def variable_ids(self):
+        return [STATE_VARIABLE_ID, self._volume_variable_id]
+
+    @callback
+    def handle_variables(self, values):
+        #is_on = values[STATE_VARIABLE_ID]
         #if is_on == '1':
         #    self._state = True
         #elif is_on == '0':
         #    self._state = False
         #else:
         #    self._state = None
-        self._state = json_text[STATE_VARIABLE_ID]
-        self._volume = float(json_text[VOLUME_VARIABLE_ID]) / 100
+        if STATE_VARIABLE_ID in values:
+            self._state = values[STATE_VARIABLE_ID]
+        if self._volume_variable_id in values:
+            try:
+                self._volume = float(values[self._volume_variable_id]) / 100
+            except ValueError:
+                _LOGGER.warning('Invalid volume value received')
+
+
+class C4MediaGroup(Control4Entity, MediaPlayerDevice):
+    """Volume control for several rooms or output zones at once. A volume
+    change is written to every member concurrently, and all members are
+    polled in the same slot so their reads go out together."""
+
+    def __init__(self, hass, name, controller, members, scan_interval):
+        self._members = [(member[CONF_PROXY_ID], volume_variable_id(member.get(CONF_OUTPUT_ZONE)))
+                         for member in members]
+        super().__init__(hass, name, controller, self._members[0][0], scan_interval)
+        self._volumes = {}
+        self._volume = 0
+
+    @property
+    def supported_features(self):
+        """Return the list of supported features."""
+        return SUPPORT_FLAGS
+
+    @property
+    def volume_level(self):
+        """Average volume of the members that have been read."""
+        if not self._volumes:
+            return self._volume
+        return sum(self._volumes.values()) / len(self._volumes)
+
+    @property
+    def device_state_attributes(self):
+        return {CONF_MEMBERS: ['{}:{}'.format(proxy_id, variable_id)
+                               for proxy_id, variable_id in self._members]}
+
+    async def async_set_volume_level(self, volume):
+        VOLUME_REAL = int(volume*100)
+        await asyncio.gather(*[self.update_state(variable_id, VOLUME_REAL, proxy_id)
+                               for proxy_id, variable_id in self._members])
+        self._volume = volume
+        self._volumes = {member: volume for member in self._members}
 
-        #try:
-        #    self._brightness = int(int(brightness)*255/100)
-        #except ValueError:
-        #    _LOGGER.warning('Invalid brightness value received')
+    @callback
+    def restore_state(self, last_state):
+        self._volume = last_state.attributes.get(ATTR_MEDIA_VOLUME_LEVEL, self._volume)
+
+    @property
+    def reads(self):
+        return [(proxy_id, [variable_id]) for proxy_id, variable_id in self._members]
+
+    def write_targets(self, variable_id=None):
+        if variable_id is None:
+            return list(self._members)
+        return [(proxy_id, variable_id)
+                for proxy_id in sorted({proxy_id for proxy_id, _ in self._members})]
+
+    @callback
+    def handle_proxy_variables(self, proxy_id, values):
+        for member_proxy_id, variable_id in self._members:
+            if member_proxy_id != proxy_id or variable_id not in values:
+                continue
+            try:
+                self._volumes[(proxy_id, variable_id)] = float(values[variable_id]) / 100
+            except ValueError:
+                _LOGGER.warning('Invalid volume value received')
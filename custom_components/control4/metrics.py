@@ -0,0 +1,103 @@
+"""
+Request counters and latency histograms for a Control4 controller.
+"""
+from bisect import bisect_left
+from collections import Counter
+
+COMMAND_GET = 'get'
+COMMAND_SET = 'set'
+
+OUTCOME_OK = 'ok'
+OUTCOME_ERROR = 'error'
+OUTCOME_TIMEOUT = 'timeout'
+
+# Upper bounds, in seconds, of the latency histogram buckets. Anything slower
+# than the last bound lands in an overflow bucket.
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples,
+        or None if nothing has been recorded."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self):
+        buckets = {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.counts)}
+        buckets['+Inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+            'buckets': buckets,
+        }
+
+
+class ControllerMetrics:
+    """Counts requests, errors and timeouts by command type and platform,
+    and keeps latency histograms for network time and time spent queued."""
+
+    def __init__(self):
+        self.requests = Counter()
+        self.errors = Counter()
+        self.timeouts = Counter()
+        self.latency = {COMMAND_GET: LatencyHistogram(), COMMAND_SET: LatencyHistogram()}
+        self.queue_wait = LatencyHistogram()
+        self.max_queue_depth = 0
+
+    def record(self, command, platform, outcome, latency, queue_wait):
+        key = (command, platform)
+        self.requests[key] += 1
+        if outcome == OUTCOME_ERROR:
+            self.errors[key] += 1
+        elif outcome == OUTCOME_TIMEOUT:
+            self.timeouts[key] += 1
+        if latency is not None and outcome == OUTCOME_OK:
+            self.latency[command].record(latency)
+        if queue_wait is not None:
+            self.queue_wait.record(queue_wait)
+
+    def record_queue_depth(self, depth):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def total(self, counter, command=None):
+        return sum(count for (key_command, _), count in counter.items()
+                   if command is None or key_command == command)
+
+    def as_dict(self):
+        def _by_key(counter):
+            return {'{}/{}'.format(command, platform): count
+                    for (command, platform), count in sorted(counter.items())}
+
+        return {
+            'requests': _by_key(self.requests),
+            'errors': _by_key(self.errors),
+            'timeouts': _by_key(self.timeouts),
+            'latency': {command: histogram.as_dict()
+                        for command, histogram in self.latency.items()},
+            'queue_wait': self.queue_wait.as_dict(),
+            'max_queue_depth': self.max_queue_depth,
+        }
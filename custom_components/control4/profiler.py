@@ -0,0 +1,115 @@
+"""
+Profiles the event loop while the Control4 integration runs, to find out
+what its polling costs.
+
+Deterministic mode uses cProfile and writes a .prof file that pstats,
+snakeviz or flameprof can read, plus a text summary of the integration's own
+functions. Sampling mode looks at the event loop thread's stack every few
+milliseconds from a background thread, which costs far less, and writes
+the stacks in the collapsed format read by flamegraph.pl and speedscope.
+"""
+import asyncio
+from collections import Counter
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+
+_LOGGER = logging.getLogger(__name__)
+
+MODE_DETERMINISTIC = 'deterministic'
+MODE_SAMPLING = 'sampling'
+
+DATA_PROFILING = 'control4_profiling'
+
+# Functions in the text summary of a deterministic profile.
+SUMMARY_LIMIT = 50
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+async def async_profile(hass, mode, duration, interval, path):
+    """Profile for duration seconds and write the report to path. Returns
+    False without profiling if a profile is already running."""
+    if hass.data.get(DATA_PROFILING):
+        _LOGGER.warning('A Control4 profile is already running')
+        return False
+    hass.data[DATA_PROFILING] = True
+    try:
+        if mode == MODE_DETERMINISTIC:
+            await _async_profile_deterministic(hass, duration, path)
+        else:
+            await _async_profile_sampling(hass, duration, interval, path)
+    finally:
+        hass.data[DATA_PROFILING] = False
+    _LOGGER.info('Control4 profile written to %s', path)
+    return True
+
+
+async def _async_profile_deterministic(hass, duration, path):
+    # cProfile only sees the thread that enables it, which has to be the
+    # event loop's.
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        profile.disable()
+    profile.create_stats()
+    await hass.async_add_executor_job(_write_deterministic, profile, path)
+
+
+def _write_deterministic(profile, path):
+    profile.dump_stats(path)
+    summary = io.StringIO()
+    stats = pstats.Stats(profile, stream=summary)
+    stats.sort_stats('cumulative').print_stats(_PACKAGE_DIR, SUMMARY_LIMIT)
+    with open(os.path.splitext(path)[0] + '.txt', 'w') as file:
+        file.write(summary.getvalue())
+
+
+async def _async_profile_sampling(hass, duration, interval, path):
+    sampler = _Sampler(threading.get_ident(), interval)
+    sampler.start()
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        sampler.stop()
+    await hass.async_add_executor_job(sampler.join)
+    await hass.async_add_executor_job(_write_collapsed, sampler.stacks, path)
+
+
+class _Sampler(threading.Thread):
+    """Counts how often each stack of the target thread is seen."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='control4_profiler', daemon=True)
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stopped = threading.Event()
+        self.stacks = Counter()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)  # pylint: disable=protected-access
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{} ({}:{})'.format(code.co_name,
+                                                 os.path.basename(code.co_filename),
+                                                 code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+
+def _write_collapsed(stacks, path):
+    with open(path, 'w') as file:
+        for stack, count in stacks.most_common():
+            file.write('{} {}\n'.format(stack, count))
@@ -0,0 +1,80 @@
+"""
+Receives variable change notifications sent by Control4 programming, e.g.
+with the Web Event driver, so entities update without waiting for a poll.
+
+    GET/POST /api/control4/event?proxyID=14&variableID=1000&value=1
+
+A POST may instead carry a JSON body of the form
+{"proxyID": 14, "variables": {"1000": "1", "1001": "75"}}.
+Requests are only accepted from the address of a configured controller.
+"""
+from http import HTTPStatus
+import ipaddress
+import logging
+import socket
+
+from homeassistant.components.http import HomeAssistantView
+
+from .const import DOMAIN, PUSH_URL
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Control4PushView(HomeAssistantView):
+
+    url = PUSH_URL
+    name = 'api:control4:event'
+    requires_auth = False
+
+    async def get(self, request):
+        return await self._async_handle(request, dict(request.query))
+
+    async def post(self, request):
+        if request.content_type == 'application/json':
+            try:
+                data = await request.json()
+            except ValueError:
+                return self.json_message('Invalid JSON', HTTPStatus.BAD_REQUEST)
+        else:
+            data = dict(await request.post())
+            data.update(request.query)
+        return await self._async_handle(request, data)
+
+    async def _async_handle(self, request, data):
+        hass = request.app['hass']
+        controller = await _async_find_controller(hass, request.remote)
+        if controller is None:
+            _LOGGER.warning('Ignoring Control4 event from unknown host %s',
+                            request.remote)
+            return self.json_message('Unknown controller', HTTPStatus.FORBIDDEN)
+
+        try:
+            proxy_id = int(data['proxyID'])
+            if 'variables' in data:
+                values = {str(variable_id): str(value)
+                          for variable_id, value in data['variables'].items()}
+            else:
+                values = {str(data['variableID']): str(data['value'])}
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return self.json_message('Expected proxyID, variableID and value',
+                                     HTTPStatus.BAD_REQUEST)
+
+        _LOGGER.debug('Control4 event from %s: %s %s', request.remote, proxy_id, values)
+        controller.async_handle_push(proxy_id, values)
+        return self.json_message('OK')
+
+
+async def _async_find_controller(hass, remote):
+    """Return the controller whose base_url host is remote, if any."""
+    for controller in hass.data.get(DOMAIN, {}).values():
+        host = controller.host
+        try:
+            ipaddress.ip_address(host)
+        except ValueError:
+            try:
+                host = await hass.async_add_executor_job(socket.gethostbyname, host)
+            except OSError:
+                continue
+        if host == remote:
+            return controller
+    return None
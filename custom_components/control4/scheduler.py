@@ -0,0 +1,172 @@
+"""
+Limits how many requests are in flight to a Control4 controller at once.
+"""
+import asyncio
+from collections import deque
+import logging
+import time
+
+from .const import (
+    CONGESTION_LATENCY,
+    LATENCY_EWMA_WEIGHT,
+    MAX_POLL_RATE_SCALE,
+    POLL_RATE_RECOVERY_STEP,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_COMMAND = 0
+PRIORITY_POLL = 1
+
+
+class RequestScheduler:
+    """Bounded-concurrency gate with one queue per priority. Waiting commands
+    are always let through before waiting polls.
+
+    Polls are additionally limited by a congestion window that is managed
+    AIMD-style from the moving average of request latency: it is halved when
+    requests time out or the average climbs past CONGESTION_LATENCY and grows
+    by about one slot per window of successful requests. Once the window is
+    down to a single poll, poll_rate_scale is doubled instead so the
+    controller stretches its poll intervals."""
+
+    def __init__(self, hass, max_in_flight):
+        self._hass = hass
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.poll_window = float(max_in_flight)
+        self.poll_rate_scale = 1.0
+        self.latency = None
+        self._last_decrease = 0
+        self._in_flight_by_lane = {
+            PRIORITY_COMMAND: 0,
+            PRIORITY_POLL: 0,
+        }
+        self._queues = {
+            PRIORITY_COMMAND: deque(),
+            PRIORITY_POLL: deque(),
+        }
+
+    @property
+    def queue_depth(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _has_waiters(self, priority):
+        return any(self._queues[lane] for lane in self._queues if lane <= priority)
+
+    def _can_start(self, priority):
+        if self.in_flight >= self.max_in_flight:
+            return False
+        if priority == PRIORITY_POLL:
+            window = max(1, min(int(self.poll_window), self.max_in_flight))
+            return self._in_flight_by_lane[PRIORITY_POLL] < window
+        return True
+
+    def _start(self, priority):
+        self.in_flight += 1
+        self._in_flight_by_lane[priority] += 1
+
+    async def async_acquire(self, priority):
+        """Wait for a request slot. Every acquire must be paired with a
+        release once the request is finished."""
+        if self._can_start(priority) and not self._has_waiters(priority):
+            self._start(priority)
+            return
+
+        future = self._hass.loop.create_future()
+        self._queues[priority].append(future)
+        try:
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled.
+                self.release(priority)
+            elif future in self._queues[priority]:
+                self._queues[priority].remove(future)
+            raise
+
+    def release(self, priority):
+        self.in_flight -= 1
+        self._in_flight_by_lane[priority] -= 1
+        self._wake_next()
+
+    def _wake_next(self):
+        for lane in sorted(self._queues):
+            queue = self._queues[lane]
+            while queue and self._can_start(lane):
+                future = queue.popleft()
+                if not future.done():
+                    self._start(lane)
+                    future.set_result(None)
+            if queue:
+                # Never let a lower priority lane overtake this one.
+                return
+
+    def record_latency(self, latency):
+        """Feed the round-trip time of a successful request into the
+        congestion window."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_EWMA_WEIGHT * (latency - self.latency)
+
+        if self.latency > CONGESTION_LATENCY:
+            self._decrease()
+        elif self.poll_rate_scale > 1:
+            self.poll_rate_scale = max(1.0, self.poll_rate_scale - POLL_RATE_RECOVERY_STEP)
+        elif self.poll_window < self.max_in_flight:
+            self.poll_window = min(float(self.max_in_flight),
+                                   self.poll_window + 1 / self.poll_window)
+            self._wake_next()
+
+    def record_timeout(self):
+        self._decrease()
+
+    def _decrease(self):
+        # Only back off once per round trip, otherwise a burst of slow
+        # responses to requests sent before the last decrease would collapse
+        # the window straight to its minimum.
+        now = time.monotonic()
+        if now - self._last_decrease < max(self.latency or 0, 1):
+            return
+        self._last_decrease = now
+
+        if self.poll_window > 1:
+            self.poll_window = max(1.0, self.poll_window / 2)
+        else:
+            self.poll_rate_scale = min(MAX_POLL_RATE_SCALE, self.poll_rate_scale * 2)
+        _LOGGER.debug('Controller congested (latency %.2fs), poll window %.1f, '
+                      'poll rate scale %.1f', self.latency or 0, self.poll_window,
+                      self.poll_rate_scale)
+
+    def request(self, priority):
+        """Async context manager holding a slot for the duration of a request.
+        Afterwards it holds how long the request queued and took."""
+        return _Slot(self, priority)
+
+
+class _Slot:
+
+    def __init__(self, scheduler, priority):
+        self._scheduler = scheduler
+        self._priority = priority
+        self.started = None
+        self.queue_depth = None
+        self.queue_wait = None
+        self.elapsed = None
+
+    async def __aenter__(self):
+        self.queue_depth = self._scheduler.queue_depth
+        queued = time.monotonic()
+        await self._scheduler.async_acquire(self._priority)
+        self.started = time.monotonic()
+        self.queue_wait = self.started - queued
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._scheduler.release(self._priority)
+        self.elapsed = time.monotonic() - self.started
+        if exc_type is None:
+            self._scheduler.record_latency(self.elapsed)
+        elif issubclass(exc_type, asyncio.TimeoutError):
+            self._scheduler.record_timeout()
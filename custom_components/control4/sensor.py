@@ -0,0 +1,193 @@
+"""
+Support for reading any Control4 variable as a sensor. You need to use
+control4-2way-web-driver along with this
+"""
+import logging
+
+import voluptuous as vol
+
+from homeassistant.components.sensor import DEVICE_CLASSES_SCHEMA, PLATFORM_SCHEMA
+from homeassistant.const import (
+    CONF_DEVICE_CLASS,
+    CONF_NAME,
+    CONF_SCAN_INTERVAL,
+    CONF_TIMEOUT,
+    CONF_TYPE,
+    CONF_UNIT_OF_MEASUREMENT,
+)
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.entity import Entity
+
+from .controller import CONTROLLER_SCHEMA, async_get_controller
+from .entity import Control4Entity
+from .metrics import COMMAND_GET, COMMAND_SET
+
+CONF_BASE_URL = 'base_url'
+CONF_PROXY_ID = 'proxy_id'
+CONF_VARIABLE_ID = 'variable_id'
+CONF_METRICS = 'metrics'
+
+TYPE_STRING = 'string'
+TYPE_INT = 'int'
+TYPE_FLOAT = 'float'
+
+TYPE_CONVERTERS = {
+    TYPE_STRING: str,
+    TYPE_INT: int,
+    TYPE_FLOAT: float,
+}
+
+DEFAULT_NAME = 'Control4 Sensor'
+DEFAULT_TIMEOUT = 10
+
+
+def _metric_total(counter, command=None):
+    return lambda metrics, scheduler: metrics.total(getattr(metrics, counter), command)
+
+
+def _metric_percentile(command, fraction):
+    return lambda metrics, scheduler: metrics.latency[command].percentile(fraction)
+
+
+# name suffix, unit, value
+METRIC_SENSORS = [
+    ('Requests', 'requests', _metric_total('requests')),
+    ('Errors', 'requests', _metric_total('errors')),
+    ('Timeouts', 'requests', _metric_total('timeouts')),
+    ('Read Latency p50', 's', _metric_percentile(COMMAND_GET, 0.5)),
+    ('Read Latency p99', 's', _metric_percentile(COMMAND_GET, 0.99)),
+    ('Write Latency p50', 's', _metric_percentile(COMMAND_SET, 0.5)),
+    ('Write Latency p99', 's', _metric_percentile(COMMAND_SET, 0.99)),
+    ('Queue Wait p99', 's', lambda metrics, scheduler: metrics.queue_wait.percentile(0.99)),
+    ('Queue Depth', 'requests', lambda metrics, scheduler: scheduler.queue_depth),
+    ('Max Queue Depth', 'requests', lambda metrics, scheduler: metrics.max_queue_depth),
+    ('In Flight', 'requests', lambda metrics, scheduler: scheduler.in_flight),
+]
+
+
+def _require_variable(config):
+    """proxy_id and variable_id are required unless the entry is for the
+    controller's metrics."""
+    if not config[CONF_METRICS]:
+        for key in (CONF_PROXY_ID, CONF_VARIABLE_ID):
+            if key not in config:
+                raise vol.Invalid('{} is required'.format(key), path=[key])
+    return config
+
+
+PLATFORM_SCHEMA = vol.All(PLATFORM_SCHEMA.extend({
+    vol.Required(CONF_BASE_URL): cv.url,
+    vol.Optional(CONF_PROXY_ID): cv.positive_int,
+    vol.Optional(CONF_VARIABLE_ID): cv.string,
+    vol.Optional(CONF_METRICS, default=False): cv.boolean,
+    vol.Optional(CONF_TYPE, default=TYPE_STRING): vol.In(list(TYPE_CONVERTERS)),
+    vol.Optional(CONF_NAME, default=DEFAULT_NAME): cv.string,
+    vol.Optional(CONF_UNIT_OF_MEASUREMENT): cv.string,
+    vol.Optional(CONF_DEVICE_CLASS): DEVICE_CLASSES_SCHEMA,
+    vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.positive_int,
+}).extend(CONTROLLER_SCHEMA), _require_variable)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# pylint: disable=unused-argument,
+async def async_setup_platform(hass, config, async_add_devices, discovery_info=None):
+    name = config.get(CONF_NAME)
+    base_url = config.get(CONF_BASE_URL)
+    proxy_id = config.get(CONF_PROXY_ID)
+    variable_id = config.get(CONF_VARIABLE_ID)
+    value_type = config.get(CONF_TYPE)
+    unit = config.get(CONF_UNIT_OF_MEASUREMENT)
+    device_class = config.get(CONF_DEVICE_CLASS)
+    scan_interval = config.get(CONF_SCAN_INTERVAL)
+    controller = async_get_controller(hass, base_url, config)
+
+    if config.get(CONF_METRICS):
+        if name == DEFAULT_NAME:
+            name = 'Control4 {}'.format(controller.host)
+        async_add_devices([C4MetricSensor(controller, '{} {}'.format(name, suffix), unit, value)
+                           for suffix, unit, value in METRIC_SENSORS])
+        return
+
+    async_add_devices([C4Sensor(hass, name, controller, proxy_id, variable_id, value_type,
+                                unit, device_class, scan_interval)])
+    controller.async_schedule_initial_refresh()
+
+
+class C4MetricSensor(Entity):
+    """One of a controller's request metrics. Read from memory on every
+    scan, so it never talks to the controller itself."""
+
+    def __init__(self, controller, name, unit, value):
+        self._controller = controller
+        self._name = name
+        self._unit = unit
+        self._value = value
+        self._state = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def unit_of_measurement(self):
+        return self._unit
+
+    async def async_update(self):
+        # Runs on the event loop, like everything that updates the metrics.
+        state = self._value(self._controller.metrics, self._controller.scheduler)
+        self._state = round(state, 3) if isinstance(state, float) else state
+
+
+class C4Sensor(Control4Entity):
+    """A single Control4 variable. Sensors on the same proxy are read
+    together in one request."""
+
+    def __init__(self, hass, name, controller, proxy_id, variable_id, value_type, unit,
+                 device_class, scan_interval):
+        super().__init__(hass, name, controller, proxy_id, scan_interval)
+        self._state = None
+        self._variable_id = variable_id
+        self._convert = TYPE_CONVERTERS[value_type]
+        self._unit = unit
+        self._device_class = device_class
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def unit_of_measurement(self):
+        return self._unit
+
+    @property
+    def device_class(self):
+        return self._device_class
+
+    @callback
+    def restore_state(self, last_state):
+        self._set_value(last_state.state)
+
+    @property
+    def write_variable_id(self):
+        return self._variable_id
+
+    @property
+    def variable_ids(self):
+        return [self._variable_id]
+
+    @callback
+    def handle_variables(self, values):
+        if self._variable_id in values:
+            self._set_value(values[self._variable_id])
+
+    def _set_value(self, value):
+        try:
+            self._state = self._convert(value)
+        except ValueError:
+            _LOGGER.warning('Invalid value received for %s: %s', self._name, value)
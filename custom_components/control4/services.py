@@ -0,0 +1,229 @@
+"""
+Services for the Control4 integration.
+"""
+import asyncio
+import logging
+import os
+import time
+
+import voluptuous as vol
+
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import callback, split_entity_id
+import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    BULK_ORDER_CONCURRENT,
+    BULK_ORDER_SEQUENTIAL,
+    CONF_BASE_URL,
+    CONF_PROXY_ID,
+    DEFAULT_BULK_MAX_PARALLEL,
+    DEFAULT_PROFILE_DURATION,
+    DEFAULT_PROFILE_INTERVAL,
+    DOMAIN,
+    EVENT_BULK_SET_RESULT,
+    PROFILE_FILENAME,
+    RECORDING_FILENAME,
+    SERVICE_BULK_SET,
+    SERVICE_PROFILE,
+    SERVICE_START_RECORDING,
+    SERVICE_STOP_RECORDING,
+)
+from .entity import Control4Entity
+from .profiler import MODE_DETERMINISTIC, MODE_SAMPLING, async_profile
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_DURATION = 'duration'
+ATTR_FILENAME = 'filename'
+ATTR_INTERVAL = 'interval'
+ATTR_ITEMS = 'items'
+ATTR_MAX_PARALLEL = 'max_parallel'
+ATTR_MODE = 'mode'
+ATTR_ORDER = 'order'
+ATTR_VARIABLE_ID = 'variable_id'
+ATTR_VALUE = 'value'
+
+BULK_SET_ITEM_SCHEMA = vol.All(
+    {
+        vol.Exclusive(ATTR_ENTITY_ID, 'target'): cv.entity_id,
+        vol.Exclusive(CONF_PROXY_ID, 'target'): cv.positive_int,
+        vol.Optional(CONF_BASE_URL): cv.url,
+        vol.Optional(ATTR_VARIABLE_ID): cv.string,
+        vol.Required(ATTR_VALUE): cv.string,
+    },
+    cv.has_at_least_one_key(ATTR_ENTITY_ID, CONF_PROXY_ID),
+)
+
+BULK_SET_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ITEMS): vol.All(cv.ensure_list, [BULK_SET_ITEM_SCHEMA]),
+    vol.Optional(CONF_BASE_URL): cv.url,
+    vol.Optional(ATTR_MAX_PARALLEL, default=DEFAULT_BULK_MAX_PARALLEL): cv.positive_int,
+    vol.Optional(ATTR_ORDER, default=BULK_ORDER_CONCURRENT):
+        vol.In([BULK_ORDER_CONCURRENT, BULK_ORDER_SEQUENTIAL]),
+})
+
+START_RECORDING_SCHEMA = vol.Schema({
+    vol.Optional(CONF_BASE_URL): cv.url,
+    vol.Optional(ATTR_FILENAME): cv.string,
+    vol.Optional(ATTR_DURATION): cv.time_period,
+})
+
+STOP_RECORDING_SCHEMA = vol.Schema({
+    vol.Optional(CONF_BASE_URL): cv.url,
+})
+
+PROFILE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_MODE, default=MODE_SAMPLING):
+        vol.In([MODE_SAMPLING, MODE_DETERMINISTIC]),
+    vol.Optional(ATTR_DURATION, default=DEFAULT_PROFILE_DURATION): cv.time_period,
+    vol.Optional(ATTR_INTERVAL, default=DEFAULT_PROFILE_INTERVAL):
+        vol.All(vol.Coerce(float), vol.Range(min=0.001)),
+    vol.Optional(ATTR_FILENAME): cv.string,
+})
+
+
+@callback
+def async_register_services(hass):
+
+    async def async_bulk_set(call):
+        await _async_bulk_set(hass, call.data)
+
+    async def async_start_recording(call):
+        await _async_start_recording(hass, call.data)
+
+    async def async_stop_recording(call):
+        for controller in _find_controllers(hass, call.data.get(CONF_BASE_URL)):
+            await controller.async_stop_recording()
+
+    async def async_profile_service(call):
+        await _async_profile(hass, call.data)
+
+    hass.services.async_register(DOMAIN, SERVICE_BULK_SET, async_bulk_set,
+                                 schema=BULK_SET_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_START_RECORDING, async_start_recording,
+                                 schema=START_RECORDING_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_STOP_RECORDING, async_stop_recording,
+                                 schema=STOP_RECORDING_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_PROFILE, async_profile_service,
+                                 schema=PROFILE_SCHEMA)
+
+
+def _find_controller(hass, base_url):
+    controllers = hass.data.get(DOMAIN, {})
+    if base_url is None:
+        if len(controllers) == 1:
+            return next(iter(controllers.values()))
+        return None
+    return controllers.get(base_url.rstrip('/'))
+
+
+def _find_controllers(hass, base_url):
+    """The controller for base_url, or every controller if it is None."""
+    if base_url is None:
+        return list(hass.data.get(DOMAIN, {}).values())
+    controller = _find_controller(hass, base_url)
+    if controller is None:
+        _LOGGER.error('%s does not match a configured controller', base_url)
+        return []
+    return [controller]
+
+
+def _resolve_item(hass, item, default_base_url):
+    """Return the controller and the (proxy_id, variable_id) pairs to write
+    for a bulk_set item, or raise ValueError describing why it can't be
+    sent. A media group item is written to every member."""
+    if ATTR_ENTITY_ID in item:
+        entity_id = item[ATTR_ENTITY_ID]
+        component = hass.data.get(split_entity_id(entity_id)[0])
+        entity = component.get_entity(entity_id) if component is not None else None
+        if not isinstance(entity, Control4Entity):
+            raise ValueError('{} is not a Control4 entity'.format(entity_id))
+        targets = entity.write_targets(item.get(ATTR_VARIABLE_ID))
+        if not targets:
+            raise ValueError('variable_id is required for {}'.format(entity_id))
+        return entity.controller, targets
+
+    if ATTR_VARIABLE_ID not in item:
+        raise ValueError('variable_id is required with proxy_id')
+    controller = _find_controller(hass, item.get(CONF_BASE_URL, default_base_url))
+    if controller is None:
+        raise ValueError('base_url does not match a configured controller')
+    return controller, [(item[CONF_PROXY_ID], item[ATTR_VARIABLE_ID])]
+
+
+async def _async_bulk_set(hass, data):
+    """Send every item through its controller's request scheduler, at most
+    max_parallel at a time, and fire an event with the result of each."""
+    started = time.monotonic()
+    items = data[ATTR_ITEMS]
+    default_base_url = data.get(CONF_BASE_URL)
+    semaphore = asyncio.Semaphore(data[ATTR_MAX_PARALLEL])
+
+    async def _async_set_item(index, item):
+        result = {'index': index}
+        try:
+            controller, targets = _resolve_item(hass, item, default_base_url)
+        except ValueError as err:
+            result.update(success=False, error=str(err))
+            return result
+
+        if len(targets) == 1:
+            result.update(proxy_id=targets[0][0], variable_id=targets[0][1])
+        else:
+            result['targets'] = [{'proxy_id': proxy_id, 'variable_id': variable_id}
+                                 for proxy_id, variable_id in targets]
+
+        async def _async_set_target(proxy_id, variable_id):
+            async with semaphore:
+                return await controller.async_set(
+                    proxy_id, variable_id, item[ATTR_VALUE], platform=SERVICE_BULK_SET)
+
+        result['success'] = all(await asyncio.gather(*[
+            _async_set_target(proxy_id, variable_id) for proxy_id, variable_id in targets]))
+        return result
+
+    if data[ATTR_ORDER] == BULK_ORDER_SEQUENTIAL:
+        results = [await _async_set_item(index, item)
+                   for index, item in enumerate(items)]
+    else:
+        results = await asyncio.gather(*[_async_set_item(index, item)
+                                         for index, item in enumerate(items)])
+
+    failed = sum(1 for result in results if not result['success'])
+    if failed:
+        _LOGGER.warning('control4.bulk_set: %d of %d items failed', failed, len(results))
+    hass.bus.async_fire(EVENT_BULK_SET_RESULT, {
+        'results': results,
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'duration': time.monotonic() - started,
+    })
+
+
+async def _async_start_recording(hass, data):
+    """Start recording every matching controller's traffic. A filename is
+    only used as is when there is a single controller to record."""
+    controllers = _find_controllers(hass, data.get(CONF_BASE_URL))
+    duration = data.get(ATTR_DURATION)
+    for controller in controllers:
+        filename = data.get(ATTR_FILENAME)
+        if filename is None or len(controllers) > 1:
+            filename = RECORDING_FILENAME.format(
+                host=controller.host, time=dt_util.now().strftime('%Y%m%d-%H%M%S'))
+        path = filename if os.path.isabs(filename) else hass.config.path(filename)
+        await controller.async_start_recording(
+            path, duration.total_seconds() if duration is not None else None)
+
+
+async def _async_profile(hass, data):
+    mode = data[ATTR_MODE]
+    filename = data.get(ATTR_FILENAME)
+    if filename is None:
+        filename = PROFILE_FILENAME.format(
+            time=dt_util.now().strftime('%Y%m%d-%H%M%S'),
+            extension='.prof' if mode == MODE_DETERMINISTIC else '.folded')
+    path = filename if os.path.isabs(filename) else hass.config.path(filename)
+    await async_profile(hass, mode, data[ATTR_DURATION].total_seconds(),
+                        data[ATTR_INTERVAL], path)
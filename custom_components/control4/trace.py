@@ -0,0 +1,41 @@
+"""
+Keeps the last requests a controller made, for the diagnostics view.
+"""
+from collections import deque
+import time
+
+from homeassistant.core import callback
+
+# Why a request was sent: a scheduled poll, the refresh right after
+# startup, an on-demand refresh such as homeassistant.update_entity, the
+# read-back after a write, or a write itself.
+SOURCE_POLL = 'poll'
+SOURCE_INITIAL = 'initial'
+SOURCE_REFRESH = 'refresh'
+SOURCE_CONFIRM = 'confirm'
+SOURCE_COMMAND = 'command'
+
+_FIELDS = ('time', 'source', 'command', 'platform', 'proxy_id', 'variable_ids',
+           'queue_wait', 'network_time', 'status', 'outcome')
+
+
+class RequestTrace:
+    """Fixed-size ring buffer of finished requests. Entries are stored as
+    tuples and only turned into dicts when the trace is read."""
+
+    def __init__(self, size):
+        self._entries = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @callback
+    def record(self, source, command, platform, proxy_id, variable_ids, queue_wait,
+               network_time, status, outcome):
+        self._entries.append((time.time(), source, command, platform, proxy_id,
+                              tuple(variable_ids), queue_wait, network_time, status,
+                              outcome))
+
+    def as_list(self):
+        """Oldest first."""
+        return [dict(zip(_FIELDS, entry)) for entry in self._entries]
@@ -0,0 +1,98 @@
+"""
+Records the requests a controller sends and the responses it gets back, so
+real traffic can be replayed offline with benchmarks/replay.py.
+
+Recordings are gzipped JSON lines. The first line describes the recording,
+every other line is one request:
+
+    {"t": 12.301, "c": "get", "p": 14, "v": ["1000", "1001"], "s": 200,
+     "l": 0.043, "r": "{\"1000\": \"1\", \"1001\": \"75\"}"}
+
+t is seconds since recording started, l the request's latency and s its
+HTTP status, or null if it failed. n holds the value sent by a set. r is
+left out when a get returned exactly what the previous get of the same
+variables did.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import time
+
+from homeassistant.core import callback
+
+_LOGGER = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Buffered lines are appended to the file in the executor once there are
+# this many of them.
+FLUSH_SIZE = 500
+
+
+class TrafficRecorder:
+
+    def __init__(self, hass, path, base_url):
+        self._hass = hass
+        self.path = path
+        self.count = 0
+        self._started = time.monotonic()
+        self._last_responses = {}
+        self._buffer = [{
+            'version': FORMAT_VERSION,
+            'base_url': base_url,
+            'started': time.time(),
+        }]
+        self._lock = asyncio.Lock()
+        self._mode = 'wt'
+
+    @callback
+    def record(self, command, proxy_id, variable_ids, value, status, latency, text=None,
+               sent=None):
+        """Record one finished request. sent is when it was sent, as a
+        time.monotonic() timestamp."""
+        line = {
+            't': round((sent or time.monotonic()) - self._started, 3),
+            'c': command,
+            'p': proxy_id,
+            'v': list(variable_ids),
+            's': status,
+            'l': None if latency is None else round(latency, 4),
+        }
+        if value is not None:
+            line['n'] = str(value)
+        if text is not None:
+            key = (proxy_id, tuple(variable_ids))
+            if self._last_responses.get(key) != text:
+                self._last_responses[key] = text
+                line['r'] = text
+        self._buffer.append(line)
+        self.count += 1
+        if len(self._buffer) >= FLUSH_SIZE:
+            self._hass.async_create_task(self.async_flush())
+
+    async def async_flush(self):
+        async with self._lock:
+            lines, self._buffer = self._buffer, []
+            if lines:
+                await self._hass.async_add_executor_job(self._write, lines)
+
+    def _write(self, lines):
+        # The first flush replaces any earlier recording at path, so the file
+        # has one header. Later flushes append a new gzip member each;
+        # gzip.open reads them as one.
+        with gzip.open(self.path, self._mode, encoding='utf-8') as file:
+            for line in lines:
+                file.write(json.dumps(line, separators=(',', ':')))
+                file.write('\n')
+        self._mode = 'at'
+
+
+def read_recording(path):
+    """Return the header and the list of requests in a recording. Headers
+    of recordings appended to the same file are skipped."""
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        lines = [json.loads(line) for line in file if line.strip()]
+    if not lines or lines[0].get('version') != FORMAT_VERSION:
+        raise ValueError('{} is not a Control4 traffic recording'.format(path))
+    return lines[0], [line for line in lines[1:] if 'version' not in line]